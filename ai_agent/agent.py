@@ -10,10 +10,9 @@ from loguru import logger
 from dataclasses import dataclass
 import asyncio
 
-from openai import AsyncOpenAI
-
 from clore_api.client import CloreAPIClient
 from config import settings
+from utils.openai_client import get_client as get_openai_client
 
 
 @dataclass
@@ -37,7 +36,7 @@ class CloreAIAgent:
     
     def __init__(self, api_key: str):
         self.clore_client = CloreAPIClient(api_key)
-        self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.openai_client = get_openai_client()  # Общий для всех агентов
         self.conversations = {}  # user_id -> messages history
         self.search_cache = {}   # Кэш результатов поиска
         self.cache_ttl = 300     # 5 минут
@@ -247,6 +246,17 @@ class CloreAIAgent:
             }
         ]
     
+    async def warmup(self):
+        """
+        Заранее открыть соединение с OpenAI, чтобы первый запрос
+        не платил за установку соединения. Clore API не трогаем -
+        у него жесткие лимиты на частоту запросов
+        """
+        try:
+            await self.openai_client.models.list()
+        except Exception as e:
+            logger.debug(f"Warmup request failed: {e}")
+    
     async def close(self):
         """Закрыть соединения"""
         await self.clore_client.close()
@@ -38,10 +38,12 @@ class CloreAPIClient:
         self.base_url = settings.clore_api_base_url
         self.client = httpx.AsyncClient(
             timeout=30.0,
-            headers={"auth": api_key}
+            headers={"auth": api_key},
+            limits=httpx.Limits(max_connections=100, keepalive_expiry=60.0)
         )
         self._last_request_time = None
         self._request_delay = 1.1  # 1.1 секунды между запросами
+        self._rate_lock = asyncio.Lock()  # Клиент может использоваться несколькими сервисами
     
     async def __aenter__(self):
         return self
@@ -56,17 +58,18 @@ class CloreAPIClient:
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Выполнить запрос к API с учетом rate limiting"""
         # Соблюдаем rate limit
-        if self._last_request_time:
-            time_since_last = datetime.now() - self._last_request_time
-            if time_since_last < timedelta(seconds=self._request_delay):
-                wait_time = self._request_delay - time_since_last.total_seconds()
-                logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
-                await asyncio.sleep(wait_time)
+        async with self._rate_lock:
+            if self._last_request_time:
+                time_since_last = datetime.now() - self._last_request_time
+                if time_since_last < timedelta(seconds=self._request_delay):
+                    wait_time = self._request_delay - time_since_last.total_seconds()
+                    logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
+                    await asyncio.sleep(wait_time)
+            self._last_request_time = datetime.now()
         
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            self._last_request_time = datetime.now()
             response = await self.client.request(method, url, **kwargs)
             response.raise_for_status()
             
@@ -210,7 +213,8 @@ class CloreAPIClient:
     
     # === Вспомогательные методы ===
     
-    def extract_server_price(self, server_data: Dict[str, Any]) -> tuple[Optional[float], Optional[str]]:
+    @staticmethod
+    def extract_server_price(server_data: Dict[str, Any]) -> tuple[Optional[float], Optional[str]]:
         """
         Извлечь актуальную цену сервера
         Returns: (price, currency_type)
@@ -231,7 +235,8 @@ class CloreAPIClient:
         
         return None, None
     
-    def extract_gpu_info(self, gpu_string: str) -> tuple[int, str]:
+    @staticmethod
+    def extract_gpu_info(gpu_string: str) -> tuple[int, str]:
         """
         Извлечь количество и модель GPU из строки
         Example: "4x NVIDIA GeForce RTX 3070" -> (4, "RTX 3070")
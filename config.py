@@ -36,6 +36,7 @@ class Settings(BaseSettings):
     # Monitoring
     balance_check_interval: int = 600  # 10 минут в секундах
     server_check_interval: int = 300   # 5 минут
+    max_concurrent_api: int = 10       # Параллельных проверок пользователей
     
     # Pagination
     servers_per_page: int = 10
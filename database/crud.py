@@ -1,9 +1,11 @@
 """
 CRUD операции для базы данных
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy import select, update, delete, and_, or_, func
+from statistics import fmean
+from sqlalchemy import select, insert, update, delete, and_, func, case, lambda_stmt, union_all
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import (
@@ -44,10 +46,17 @@ async def create_user(
 
 async def update_user_api_key(db: AsyncSession, telegram_id: int, api_key: str) -> bool:
     """Обновить API ключ пользователя"""
+    return await update_user_fields(
+        db, telegram_id, clore_api_key=api_key, updated_at=datetime.utcnow()
+    )
+
+
+async def update_user_fields(db: AsyncSession, telegram_id: int, **values) -> bool:
+    """Обновить поля пользователя одним UPDATE без предварительного SELECT"""
     result = await db.execute(
         update(User)
         .where(User.telegram_id == telegram_id)
-        .values(clore_api_key=api_key, updated_at=datetime.utcnow())
+        .values(**values)
     )
     await db.commit()
     return result.rowcount > 0
@@ -66,6 +75,24 @@ async def get_active_users(db: AsyncSession) -> List[User]:
     return result.scalars().all()
 
 
+async def get_users_by_ids(db: AsyncSession, user_ids) -> Dict[int, User]:
+    """Получить пользователей по списку ID одним запросом"""
+    if not user_ids:
+        return {}
+    result = await db.execute(select(User).where(User.id.in_(list(user_ids))))
+    return {user.id: user for user in result.scalars()}
+
+
+async def get_users_by_telegram_ids(db: AsyncSession, telegram_ids) -> Dict[int, User]:
+    """Получить пользователей по списку Telegram ID одним запросом"""
+    if not telegram_ids:
+        return {}
+    result = await db.execute(
+        select(User).where(User.telegram_id.in_(list(telegram_ids)))
+    )
+    return {user.telegram_id: user for user in result.scalars()}
+
+
 # === Balance History ===
 
 async def save_balance_snapshot(
@@ -145,13 +172,16 @@ async def get_balance_history(
 
 # === Orders ===
 
-async def save_order(
-    db: AsyncSession,
-    user_id: int,
-    order_data: Dict[str, Any]
-) -> Order:
-    """Сохранить информацию о заказе"""
-    order = Order(
+def _build_order_row(user_id: int, order_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Собрать строку заказа из данных API"""
+    created_at = datetime.fromtimestamp(order_data.get('ct', 0))
+    
+    # Рассчитываем время истечения
+    expires_at = None
+    if order_data.get('mrl'):
+        expires_at = created_at + timedelta(seconds=order_data['mrl'])
+    
+    return dict(
         user_id=user_id,
         clore_order_id=order_data['id'],
         server_id=order_data.get('si'),
@@ -170,19 +200,40 @@ async def save_order(
         pub_cluster=order_data.get('pub_cluster', []),
         tcp_ports=order_data.get('tcp_ports', {}),
         http_port=order_data.get('http_port'),
-        created_at=datetime.fromtimestamp(order_data.get('ct', 0)),
+        created_at=created_at,
+        expires_at=expires_at,
         server_specs=order_data.get('specs', {})
     )
-    
-    # Рассчитываем время истечения
-    if order_data.get('mrl'):
-        order.expires_at = order.created_at + timedelta(seconds=order_data['mrl'])
+
+
+async def save_order(
+    db: AsyncSession,
+    user_id: int,
+    order_data: Dict[str, Any]
+) -> Order:
+    """Сохранить информацию о заказе"""
+    order = Order(**_build_order_row(user_id, order_data))
     
     db.add(order)
     await db.commit()
     return order
 
 
+async def save_orders_bulk(
+    db: AsyncSession,
+    user_id: int,
+    orders: List[Dict[str, Any]]
+) -> int:
+    """Сохранить пачку новых заказов одним INSERT"""
+    rows = [_build_order_row(user_id, order_data) for order_data in orders]
+    if not rows:
+        return 0
+    
+    await db.execute(insert(Order.__table__), rows)
+    await db.commit()
+    return len(rows)
+
+
 async def update_order_status(
     db: AsyncSession,
     clore_order_id: int,
@@ -205,57 +256,104 @@ async def update_order_status(
     return result.rowcount > 0
 
 
-async def get_active_orders(db: AsyncSession, user_id: int) -> List[Order]:
-    """Получить активные заказы пользователя"""
+async def update_orders_spent_bulk(
+    db: AsyncSession,
+    spent: Dict[int, float]
+) -> int:
+    """Отметить заказы активными и обновить потраченные суммы одним UPDATE"""
+    if not spent:
+        return 0
+    
+    # Как в update_order_status: без суммы (None) оставляем прежнее значение
+    known = {order_id: value for order_id, value in spent.items() if value is not None}
+    values = {'status': 'active'}
+    if known:
+        values['total_spent'] = case(
+            known, value=Order.clore_order_id, else_=Order.total_spent
+        )
+    
+    result = await db.execute(
+        update(Order)
+        .where(Order.clore_order_id.in_(list(spent)))
+        .values(**values)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def expire_missing_orders(
+    db: AsyncSession,
+    user_id: int,
+    active_order_ids
+) -> List[int]:
+    """Пометить завершенными активные заказы, которых нет среди активных в API"""
     result = await db.execute(
-        select(Order)
+        update(Order)
         .where(
             and_(
                 Order.user_id == user_id,
-                Order.status == 'active'
+                Order.status == 'active',
+                Order.clore_order_id.notin_(list(active_order_ids))
             )
         )
-        .order_by(Order.created_at.desc())
+        .values(status='expired')
+        .returning(Order.clore_order_id)
     )
+    expired = list(result.scalars())
+    await db.commit()
+    return expired
+
+
+async def get_active_orders(db: AsyncSession, user_id: int) -> List[Order]:
+    """Получить активные заказы пользователя"""
+    # lambda_stmt кеширует скомпилированный SQL между вызовами
+    stmt = lambda_stmt(lambda: select(Order))
+    stmt += lambda s: s.where(
+        and_(
+            Order.user_id == user_id,
+            Order.status == 'active'
+        )
+    ).order_by(Order.created_at.desc())
+    result = await db.execute(stmt)
     return result.scalars().all()
 
 
 # === Server Snapshots ===
 
-async def save_server_snapshot(
-    db: AsyncSession,
+def _build_server_snapshot_row(
     user_id: int,
     server_data: Dict[str, Any],
-    snapshot_type: str = 'marketplace'
-) -> ServerSnapshot:
-    """Сохранить снимок сервера"""
+    snapshot_type: str
+) -> Dict[str, Any]:
+    """Собрать строку снимка сервера из данных API"""
     from clore_api.client import CloreAPIClient
-    from config import settings
     
-    client = CloreAPIClient("")  # Временный клиент для вспомогательных методов
-    
-    # Извлекаем данные
-    specs = server_data.get('specs', {})
+    # Извлекаем данные (specs читаем один раз)
+    specs = server_data.get('specs') or {}
     gpu_str = specs.get('gpu', '')
-    gpu_count, gpu_model = client.extract_gpu_info(gpu_str)
+    gpu_count, gpu_model = CloreAPIClient.extract_gpu_info(gpu_str)
     
     # Цены
-    price_usd, price_source = client.extract_server_price(server_data)
-    price_data = server_data.get('price', {})
-    price_clore = price_data.get('on_demand', {}).get('CLORE-Blockchain')
+    price_usd, price_source = CloreAPIClient.extract_server_price(server_data)
+    price_data = server_data.get('price') or {}
+    price_clore = (price_data.get('on_demand') or {}).get('CLORE-Blockchain')
     
     # Power limit
-    power_limits = server_data.get('specs', {}).get('stock_pl', [])
-    avg_power = sum(power_limits) / len(power_limits) if power_limits else 0
+    stock_pl = specs.get('stock_pl') or ()
+    avg_power = fmean(stock_pl) if stock_pl else 0
     
     # Рейтинг
     rating_data = server_data.get('rating', {})
     
-    snapshot = ServerSnapshot(
+    return dict(
         user_id=user_id,
         server_id=server_data.get('id'),
         snapshot_type=snapshot_type,
-        raw_data=server_data,
+        # Служебные разобранные поля монитора охоты в снимок не сохраняем
+        raw_data=(
+            {k: v for k, v in server_data.items() if k != '_parsed'}
+            if '_parsed' in server_data else server_data
+        ),
         gpu_model=gpu_model,
         gpu_count=gpu_count,
         gpu_ram=specs.get('gpuram', 0),
@@ -272,12 +370,44 @@ async def save_server_snapshot(
         rating=rating_data.get('avg', 0),
         rating_count=rating_data.get('cnt', 0)
     )
+
+
+async def save_server_snapshot(
+    db: AsyncSession,
+    user_id: int,
+    server_data: Dict[str, Any],
+    snapshot_type: str = 'marketplace'
+) -> ServerSnapshot:
+    """Сохранить снимок сервера"""
+    snapshot = ServerSnapshot(
+        **_build_server_snapshot_row(user_id, server_data, snapshot_type)
+    )
     
     db.add(snapshot)
     await db.commit()
     return snapshot
 
 
+async def save_server_snapshots_bulk(
+    db: AsyncSession,
+    user_id: int,
+    servers: List[Dict[str, Any]],
+    snapshot_type: str = 'marketplace'
+) -> int:
+    """Сохранить пачку снимков серверов одним INSERT без ORM-объектов"""
+    rows = [
+        _build_server_snapshot_row(user_id, server_data, snapshot_type)
+        for server_data in servers
+    ]
+    if not rows:
+        return 0
+    
+    # Снимки только добавляются, поэтому идем мимо identity map сессии
+    await db.execute(insert(ServerSnapshot.__table__), rows)
+    await db.commit()
+    return len(rows)
+
+
 async def get_server_price_history(
     db: AsyncSession,
     server_id: int,
@@ -306,36 +436,36 @@ async def get_docker_templates(
     include_global: bool = True
 ) -> List[DockerTemplate]:
     """Получить Docker шаблоны"""
-    conditions = []
+    # Вместо OR с IS NULL - отдельные выборки, каждая идет по своему индексу
+    parts = []
     
     if user_id:
-        conditions.append(DockerTemplate.user_id == user_id)
+        parts.append(select(DockerTemplate).where(DockerTemplate.user_id == user_id))
     
     if include_global:
-        conditions.append(DockerTemplate.user_id.is_(None))
+        parts.append(select(DockerTemplate).where(DockerTemplate.user_id.is_(None)))
     
-    if conditions:
-        where_clause = or_(*conditions)
+    if not parts:
+        stmt = select(DockerTemplate).order_by(DockerTemplate.usage_count.desc())
+    elif len(parts) == 1:
+        stmt = parts[0].order_by(DockerTemplate.usage_count.desc())
     else:
-        where_clause = True
+        subq = union_all(*parts).subquery()
+        template = aliased(DockerTemplate, subq)
+        stmt = select(template).order_by(template.usage_count.desc())
     
-    result = await db.execute(
-        select(DockerTemplate)
-        .where(where_clause)
-        .order_by(DockerTemplate.usage_count.desc())
-    )
+    result = await db.execute(stmt)
     return result.scalars().all()
 
 
-async def create_docker_template(
-    db: AsyncSession,
+def _build_docker_template(
     name: str,
     image: str,
     user_id: Optional[int] = None,
     **kwargs
 ) -> DockerTemplate:
-    """Создать Docker шаблон"""
-    template = DockerTemplate(
+    """Собрать объект Docker шаблона со значениями по умолчанию"""
+    return DockerTemplate(
         user_id=user_id,
         name=name,
         image=image,
@@ -349,12 +479,35 @@ async def create_docker_template(
         min_gpu_count=kwargs.get('min_gpu_count'),
         required_gpu_models=kwargs.get('required_gpu_models', [])
     )
+
+
+async def create_docker_template(
+    db: AsyncSession,
+    name: str,
+    image: str,
+    user_id: Optional[int] = None,
+    **kwargs
+) -> DockerTemplate:
+    """Создать Docker шаблон"""
+    template = _build_docker_template(name, image, user_id, **kwargs)
     
     db.add(template)
     await db.commit()
     return template
 
 
+async def create_docker_templates_bulk(
+    db: AsyncSession,
+    templates: List[Dict[str, Any]]
+) -> List[DockerTemplate]:
+    """Создать несколько Docker шаблонов одним коммитом"""
+    objects = [_build_docker_template(**template_data) for template_data in templates]
+    
+    db.add_all(objects)
+    await db.commit()
+    return objects
+
+
 # === Hunt Tasks ===
 
 async def create_hunt_task(
@@ -382,12 +535,21 @@ async def create_hunt_task(
 
 async def get_active_hunt_tasks(db: AsyncSession) -> List[HuntTask]:
     """Получить активные задачи охоты"""
+    stmt = lambda_stmt(lambda: select(HuntTask))
+    stmt += lambda s: s.where(HuntTask.is_active == True).order_by(HuntTask.created_at)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def update_hunt_task_status(db: AsyncSession, task_id: int, is_active: bool) -> bool:
+    """Включить/выключить задачу охоты"""
     result = await db.execute(
-        select(HuntTask)
-        .where(HuntTask.is_active == True)
-        .order_by(HuntTask.created_at)
+        update(HuntTask)
+        .where(HuntTask.id == task_id)
+        .values(is_active=is_active, updated_at=datetime.utcnow())
     )
-    return result.scalars().all()
+    await db.commit()
+    return result.rowcount > 0
 
 
 # === Exchange Rates ===
@@ -398,17 +560,14 @@ async def get_current_exchange_rate(
     currency_to: str
 ) -> Optional[float]:
     """Получить текущий курс обмена"""
-    result = await db.execute(
-        select(ExchangeRate.rate)
-        .where(
-            and_(
-                ExchangeRate.currency_from == currency_from,
-                ExchangeRate.currency_to == currency_to
-            )
+    stmt = lambda_stmt(lambda: select(ExchangeRate.rate))
+    stmt += lambda s: s.where(
+        and_(
+            ExchangeRate.currency_from == currency_from,
+            ExchangeRate.currency_to == currency_to
         )
-        .order_by(ExchangeRate.updated_at.desc())
-        .limit(1)
-    )
+    ).order_by(ExchangeRate.updated_at.desc()).limit(1)
+    result = await db.execute(stmt)
     return result.scalar_one_or_none()
 
 
@@ -473,38 +632,86 @@ async def create_alert(
     return alert
 
 
+async def create_alerts_bulk(db: AsyncSession, alerts: List[Dict[str, Any]]) -> int:
+    """Создать пачку уведомлений одним INSERT"""
+    if not alerts:
+        return 0
+    
+    await db.execute(insert(Alert.__table__), alerts)
+    await db.commit()
+    return len(alerts)
+
+
 async def get_unsent_alerts(db: AsyncSession, user_id: int) -> List[Alert]:
     """Получить неотправленные уведомления"""
-    result = await db.execute(
-        select(Alert)
-        .where(
-            and_(
-                Alert.user_id == user_id,
-                Alert.is_sent == False
-            )
+    stmt = lambda_stmt(lambda: select(Alert))
+    stmt += lambda s: s.where(
+        and_(
+            Alert.user_id == user_id,
+            Alert.is_sent == False
         )
-        .order_by(Alert.created_at)
-    )
+    ).order_by(Alert.created_at)
+    result = await db.execute(stmt)
     return result.scalars().all()
 
 
+async def get_unsent_alerts_with_user(db: AsyncSession) -> List[Tuple[Alert, int, bool]]:
+    """Получить все неотправленные уведомления вместе с данными получателя одним запросом"""
+    result = await db.execute(
+        select(Alert, User.telegram_id, User.alert_sound_enabled)
+        .join(User, User.id == Alert.user_id)
+        .where(Alert.is_sent == False)
+        .order_by(Alert.user_id, Alert.created_at)
+    )
+    return result.all()
+
+
 async def mark_alert_sent(
     db: AsyncSession,
     alert_id: int,
     error: Optional[str] = None
 ) -> bool:
     """Отметить уведомление как отправленное"""
-    values = {
-        'is_sent': True,
-        'sent_at': datetime.utcnow()
-    }
     if error:
-        values['error'] = error
+        updated = await mark_alerts_sent_bulk(db, [], failed=[(alert_id, error)])
+    else:
+        updated = await mark_alerts_sent_bulk(db, [alert_id])
+    return updated > 0
+
+
+async def mark_alerts_sent_bulk(
+    db: AsyncSession,
+    alert_ids: List[int],
+    failed: Optional[List[Tuple[int, str]]] = None
+) -> int:
+    """Отметить пачку уведомлений как отправленные одним коммитом"""
+    if not alert_ids and not failed:
+        return 0
+    
+    now = datetime.utcnow()
+    updated = 0
+    
+    if alert_ids:
+        result = await db.execute(
+            update(Alert)
+            .where(Alert.id.in_(alert_ids))
+            .values(is_sent=True, sent_at=now)
+        )
+        updated += result.rowcount
+    
+    if failed:
+        # Ошибки пишем одним UPDATE ... CASE по id
+        errors = dict(failed)
+        result = await db.execute(
+            update(Alert)
+            .where(Alert.id.in_(list(errors)))
+            .values(
+                is_sent=True,
+                sent_at=now,
+                error=case(errors, value=Alert.id)
+            )
+        )
+        updated += result.rowcount
     
-    result = await db.execute(
-        update(Alert)
-        .where(Alert.id == alert_id)
-        .values(**values)
-    )
     await db.commit()
-    return result.rowcount > 0
\ No newline at end of file
+    return updated
@@ -1,7 +1,7 @@
 """
 Модели базы данных для Clore Bot Pro
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, JSON, Text, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, JSON, Text, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,7 +13,7 @@ class User(Base):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True, nullable=False, index=True)
+    telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
     username = Column(String(64))
     first_name = Column(String(64))
     last_name = Column(String(64))
@@ -47,7 +47,8 @@ class User(Base):
     # Связи
     balance_history = relationship("BalanceHistory", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
-    server_snapshots = relationship("ServerSnapshot", back_populates="user", cascade="all, delete-orphan")
+    # Снимки пишутся напрямую через Core insert, со стороны User только чтение
+    server_snapshots = relationship("ServerSnapshot", back_populates="user", viewonly=True)
     docker_templates = relationship("DockerTemplate", back_populates="user", cascade="all, delete-orphan")
     hunt_tasks = relationship("HuntTask", back_populates="user", cascade="all, delete-orphan")
     
@@ -90,8 +91,8 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     
     # ID из Clore API
-    clore_order_id = Column(Integer, unique=True, index=True)
-    server_id = Column(Integer, index=True)
+    clore_order_id = Column(BigInteger, unique=True, index=True)
+    server_id = Column(BigInteger, index=True)
     
     # Тип и статус
     order_type = Column(String(16))  # 'on-demand' или 'spot'
@@ -143,7 +144,7 @@ class ServerSnapshot(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     
     # Идентификация
-    server_id = Column(Integer, index=True)
+    server_id = Column(BigInteger, index=True)
     snapshot_type = Column(String(16))  # 'marketplace', 'my_server'
     
     # Полный снимок данных
@@ -220,6 +221,13 @@ class DockerTemplate(Base):
     
     __table_args__ = (
         UniqueConstraint('user_id', 'name', name='_user_template_name_uc'),
+        Index('idx_docker_user', 'user_id'),
+        # Частичный индекс для частого запроса "только глобальные шаблоны"
+        Index(
+            'idx_docker_global', 'usage_count',
+            postgresql_where=text('user_id IS NULL'),
+            sqlite_where=text('user_id IS NULL')
+        ),
     )
 
 
@@ -260,12 +268,12 @@ class HuntResult(Base):
     id = Column(Integer, primary_key=True)
     hunt_task_id = Column(Integer, ForeignKey('hunt_tasks.id'), nullable=False)
     
-    server_id = Column(Integer)
+    server_id = Column(BigInteger)
     server_data = Column(JSON)
     
     found_at = Column(DateTime, default=datetime.utcnow)
     rented = Column(Boolean, default=False)
-    rent_order_id = Column(Integer)
+    rent_order_id = Column(BigInteger)
     
     # Связи
     task = relationship("HuntTask", back_populates="results")
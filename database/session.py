@@ -4,19 +4,55 @@
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import select, func
+from sqlalchemy import select, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config import settings
 from database.models import Base
 
 
+def _pool_options(database_url: str) -> dict:
+    """Параметры постоянного пула соединений"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory SQLite живет в одном соединении (StaticPool по умолчанию)
+        return {}
+    
+    options = dict(
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
+    if url.get_backend_name() == 'sqlite':
+        # aiosqlite по умолчанию использует NullPool и открывает файл на каждую сессию,
+        # теряя кеш страниц SQLite; держим соединения открытыми
+        options['poolclass'] = AsyncAdaptedQueuePool
+    return options
+
+
 # Создаем асинхронный движок
 engine = create_async_engine(
     settings.database_url,
     echo=False,
-    future=True
+    future=True,
+    query_cache_size=1200,  # Запас под lambda_stmt горячих запросов
+    **_pool_options(settings.database_url)
 )
 
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Настройка SQLite при открытии соединения"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=1073741824")  # 1 GB memory-mapped I/O
+        cursor.execute("PRAGMA cache_size=-65536")     # 64 MB page cache
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
 # Фабрика сессий
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -35,28 +71,49 @@ async def init_db():
     await init_exchange_rates()
 
 
+async def close_db():
+    """Закрыть соединения пула при остановке приложения"""
+    await engine.dispose()
+
+
 async def init_exchange_rates():
     """Инициализация курсов валют"""
     from database.models import ExchangeRate
     
+    values = dict(
+        currency_from="CLORE",
+        currency_to="USD",
+        rate=settings.clore_to_usd,
+        source="manual"
+    )
+    
     async with get_db() as db:
-        # Проверяем, есть ли уже курсы
-        stmt = select(func.count()).select_from(ExchangeRate).where(
+        dialect = engine.dialect.name
+        
+        if dialect in ('postgresql', 'sqlite'):
+            # INSERT ... ON CONFLICT DO NOTHING - идемпотентно при одновременном старте
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            
+            stmt = insert(ExchangeRate).values(**values).on_conflict_do_nothing(
+                index_elements=['currency_from', 'currency_to']
+            )
+            await db.execute(stmt)
+            await db.commit()
+            return
+        
+        # Остальные БД: проверка существования вместо полного count(*)
+        exists_stmt = select(ExchangeRate.id).where(
             (ExchangeRate.currency_from == 'CLORE') & 
             (ExchangeRate.currency_to == 'USD')
-        )
-        result = await db.execute(stmt)
-        count = result.scalar()
+        ).limit(1)
+        has_rate = (await db.execute(exists_stmt)).first() is not None
         
-        if count == 0:
+        if not has_rate:
             # Добавляем начальный курс
-            rate = ExchangeRate(
-                currency_from="CLORE",
-                currency_to="USD",
-                rate=settings.clore_to_usd,
-                source="manual"
-            )
-            db.add(rate)
+            db.add(ExchangeRate(**values))
             await db.commit()
 
 
@@ -7,7 +7,7 @@ from datetime import datetime
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from rich.layout import Layout
+from rich.text import Text
 from rich.live import Live
 from rich.progress import Progress, SpinnerColumn, TextColumn
 import random
@@ -134,33 +134,45 @@ async def demo_monitoring():
     """Демонстрация мониторинга"""
     console.print("\n[bold yellow]📊 Демонстрация мониторинга[/bold yellow]")
     
-    with Live(generate_monitoring_display(), refresh_per_second=2) as live:
-        for _ in range(6):
+    with Live(generate_monitoring_display(0), refresh_per_second=2) as live:
+        for tick in range(1, 7):
             await asyncio.sleep(0.5)
-            live.update(generate_monitoring_display())
+            live.update(generate_monitoring_display(tick))
 
 
-def generate_monitoring_display():
-    """Генерация дисплея мониторинга"""
-    layout = Layout()
-    
-    # Случайные данные для демонстрации
-    balance = 1234.56 + random.uniform(-10, 10)
-    active_orders = random.randint(3, 5)
-    
-    monitoring_text = f"""
+# Шаблон дисплея мониторинга - собирается один раз, на каждом тике меняются только числа
+MONITORING_TEMPLATE = """
 [bold]Мониторинг системы[/bold]
-Время: {datetime.now().strftime('%H:%M:%S')}
+Время: {time}
 
 [green]● Баланс CLORE:[/green] {balance:.2f}
-[green]● Активных аренд:[/green] {active_orders}
+[green]● Активных аренд:[/green] {orders}
 [yellow]● Проверка серверов:[/yellow] OK
 [blue]● AI агент:[/blue] Готов
 
 [dim]Следующая проверка через 5 мин[/dim]
     """
-    
-    return Panel(monitoring_text, title="Статус", border_style="blue")
+
+# Заранее сгенерированные случайные данные для демонстрации
+_DEMO_TICKS = 600
+_BALANCE_NOISE = tuple(random.uniform(-10, 10) for _ in range(_DEMO_TICKS))
+_ACTIVE_ORDERS = tuple(random.randint(3, 5) for _ in range(_DEMO_TICKS))
+
+_monitoring_panel = Panel("", title="Статус", border_style="blue")
+
+
+def generate_monitoring_display(tick: int = 0):
+    """Генерация дисплея мониторинга"""
+    i = tick % _DEMO_TICKS
+    
+    _monitoring_panel.renderable = Text.from_markup(
+        MONITORING_TEMPLATE.format(
+            time=datetime.now().strftime('%H:%M:%S'),
+            balance=1234.56 + _BALANCE_NOISE[i],
+            orders=_ACTIVE_ORDERS[i]
+        )
+    )
+    return _monitoring_panel
 
 
 if __name__ == "__main__":
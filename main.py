@@ -6,9 +6,11 @@ import sys
 from loguru import logger
 
 from telegram_bot.bot import CloreBot
-from database.session import init_db
+from database.session import init_db, close_db
 from services.monitoring.balance_monitor import BalanceMonitor
 from services.monitoring.server_monitor import ServerMonitor
+from services.monitoring.client_pool import close_all as close_all_clients
+from utils.openai_client import close as close_openai_client
 from config import settings
 
 
@@ -60,6 +62,10 @@ async def main():
         # Остановка всех сервисов
         logger.info("Stopping services...")
         
+        # Останавливаем мониторы до закрытия пулов клиентов и БД
+        await balance_monitor.stop()
+        await server_monitor.stop()
+        
         # Отмена фоновых задач
         for task in monitor_tasks:
             task.cancel()
@@ -71,6 +77,13 @@ async def main():
         # Остановка бота
         await bot.stop()
         
+        # Закрываем общие клиенты Clore API
+        await close_all_clients()
+        await close_openai_client()
+        
+        # Закрываем пул соединений с БД
+        await close_db()
+        
         logger.info("Clore Bot Pro stopped.")
 
 
@@ -2,15 +2,17 @@
 Сервис отправки уведомлений
 """
 import asyncio
-from typing import Optional
+from itertools import groupby
+from typing import Optional, List, Tuple
 from datetime import datetime
 from loguru import logger
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from config import settings
 from database.session import get_db
-from database.crud import get_unsent_alerts, mark_alert_sent
+from database.crud import get_unsent_alerts_with_user, mark_alerts_sent_bulk
 
 
 class AlertService:
@@ -20,6 +22,8 @@ class AlertService:
         self.bot = bot
         self.running = False
         self.check_interval = 30  # Проверка каждые 30 секунд
+        self._send_sem = asyncio.Semaphore(20)  # Ограничение параллельных отправок в Telegram
+        self.max_send_attempts = 3  # Попыток при TelegramRetryAfter
     
     async def start(self):
         """Запустить сервис уведомлений"""
@@ -42,59 +46,75 @@ class AlertService:
     async def _process_alerts(self):
         """Обработать неотправленные уведомления"""
         async with get_db() as db:
-            # Получаем всех пользователей с неотправленными алертами
-            result = await db.execute(
-                """
-                SELECT DISTINCT user_id FROM alerts 
-                WHERE is_sent = false
-                """
-            )
-            user_ids = [row[0] for row in result.fetchall()]
+            # Алерты вместе с telegram_id и настройкой звука - один запрос
+            rows = await get_unsent_alerts_with_user(db)
             
-            for user_id in user_ids:
-                user_alerts = await get_unsent_alerts(db, user_id)
-                
-                for alert in user_alerts:
-                    await self._send_alert(alert)
+            await self.flush_alerts(db, rows)
     
-    async def _send_alert(self, alert):
+    async def flush_alerts(self, db, rows):
+        """Отправить неотправленные уведомления пачкой и отметить их одним UPDATE"""
+        if not rows:
+            return
+        
+        # Строки отсортированы по user_id - группируем в корзины по пользователю
+        buckets = [list(group) for _, group in groupby(rows, key=lambda row: row[0].user_id)]
+        
+        # Пользователи обрабатываются параллельно, алерты одного пользователя - по порядку
+        results = await asyncio.gather(*(self._send_bucket(bucket) for bucket in buckets))
+        
+        sent_ids = []
+        failed = []
+        for bucket_sent, bucket_failed in results:
+            sent_ids.extend(bucket_sent)
+            failed.extend(bucket_failed)
+        
+        await mark_alerts_sent_bulk(db, sent_ids, failed)
+    
+    async def _send_bucket(self, rows) -> Tuple[List[int], List[Tuple[int, str]]]:
+        """Последовательно отправить алерты одного пользователя"""
+        sent_ids = []
+        failed = []
+        
+        for alert, telegram_id, sound_enabled in rows:
+            try:
+                await self._send_with_retry(alert, telegram_id, sound_enabled)
+                sent_ids.append(alert.id)
+            except Exception as e:
+                logger.error(f"Failed to send alert {alert.id}: {e}")
+                failed.append((alert.id, str(e)))
+        
+        return sent_ids, failed
+    
+    async def _send_with_retry(self, alert, telegram_id: int, sound_enabled: bool):
+        """Отправить алерт, выжидая flood control Telegram"""
+        for attempt in range(self.max_send_attempts):
+            try:
+                async with self._send_sem:
+                    await self._send_alert(alert, telegram_id, sound_enabled)
+                return
+            except TelegramRetryAfter as e:
+                if attempt == self.max_send_attempts - 1:
+                    raise
+                # Ждем вне семафора, чтобы не блокировать отправку другим пользователям
+                logger.warning(f"Flood control for alert {alert.id}, retry in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+    
+    async def _send_alert(self, alert, telegram_id: int, sound_enabled: bool):
         """Отправить конкретное уведомление"""
-        try:
-            # Получаем пользователя для telegram_id
-            async with get_db() as db:
-                result = await db.execute(
-                    f"SELECT telegram_id, alert_sound_enabled FROM users WHERE id = {alert.user_id}"
-                )
-                user_data = result.fetchone()
-                
-                if not user_data:
-                    logger.error(f"User {alert.user_id} not found for alert {alert.id}")
-                    return
-                
-                telegram_id, sound_enabled = user_data
-                
-                # Формируем сообщение
-                message = f"**{alert.title}**\n\n{alert.message}"
-                
-                # Добавляем клавиатуру в зависимости от типа
-                keyboard = self._get_alert_keyboard(alert.alert_type)
-                
-                # Отправляем
-                await self.bot.send_message(
-                    chat_id=telegram_id,
-                    text=message,
-                    parse_mode="Markdown",
-                    reply_markup=keyboard,
-                    disable_notification=not sound_enabled
-                )
-                
-                # Отмечаем как отправленное
-                await mark_alert_sent(db, alert.id)
-                
-        except Exception as e:
-            logger.error(f"Failed to send alert {alert.id}: {e}")
-            async with get_db() as db:
-                await mark_alert_sent(db, alert.id, error=str(e))
+        # Формируем сообщение
+        message = f"**{alert.title}**\n\n{alert.message}"
+        
+        # Добавляем клавиатуру в зависимости от типа
+        keyboard = self._get_alert_keyboard(alert.alert_type)
+        
+        # Отправляем
+        await self.bot.send_message(
+            chat_id=telegram_id,
+            text=message,
+            parse_mode="Markdown",
+            reply_markup=keyboard,
+            disable_notification=not sound_enabled
+        )
     
     def _get_alert_keyboard(self, alert_type: str) -> Optional[InlineKeyboardMarkup]:
         """Получить клавиатуру для типа уведомления"""
@@ -2,16 +2,19 @@
 Мониторинг баланса пользователей
 """
 import asyncio
+import time
+from typing import Dict, Any, List
 from datetime import datetime
 from loguru import logger
 
 from config import settings
 from database.session import get_db
 from database.crud import (
-    get_active_users, save_balance_snapshot, 
+    get_active_users, get_users_by_ids, save_balance_snapshot, 
     create_alert, get_balance_history
 )
-from clore_api.client import CloreAPIClient
+from services.monitoring.client_pool import lease
+from services.monitoring.scheduler import UserScheduler
 
 
 class BalanceMonitor:
@@ -20,74 +23,129 @@ class BalanceMonitor:
     def __init__(self):
         self.running = False
         self.check_interval = settings.balance_check_interval
+        self._sem = asyncio.Semaphore(settings.max_concurrent_api or 10)
+        # Пользователи проверяются по своим дедлайнам, а не все разом
+        self._scheduler = UserScheduler(self.check_interval)
+        self._last_balances: Dict[int, tuple] = {}  # Последние балансы для выбора интервала
     
     async def start(self):
         """Запустить мониторинг"""
         self.running = True
         logger.info("Balance monitor started")
         
+        users = {}
+        next_refresh = 0.0
+        
         while self.running:
+            now = time.monotonic()
             try:
-                await self._check_all_balances()
+                # Список пользователей обновляем раз в базовый интервал
+                if now >= next_refresh:
+                    users = await self._load_users()
+                    self._scheduler.sync(users, now)
+                    # Балансы выбывших пользователей больше не нужны
+                    for user_id in self._last_balances.keys() - users.keys():
+                        del self._last_balances[user_id]
+                    next_refresh = now + self.check_interval
+                
+                due_ids = self._scheduler.pop_due(now)
+                if due_ids:
+                    await self._check_all_balances(await self._reload_users(due_ids, now))
             except Exception as e:
                 logger.error(f"Error in balance monitor: {e}")
             
-            await asyncio.sleep(self.check_interval)
+            # Спим до ближайшего дедлайна или обновления списка
+            next_due = self._scheduler.next_due()
+            wake_at = next_refresh if next_due is None else min(next_due, next_refresh)
+            await asyncio.sleep(max(wake_at - time.monotonic(), 1.0))
     
     async def stop(self):
         """Остановить мониторинг"""
         self.running = False
         logger.info("Balance monitor stopped")
     
-    async def _check_all_balances(self):
-        """Проверить балансы всех активных пользователей"""
-        async with get_db() as db:
-            users = await get_active_users(db)
-            
-            for user in users:
+    async def _check_all_balances(self, users):
+        """Проверить балансы пользователей, чей срок проверки наступил"""
+        async def _check_one(user):
+            changed = False
+            async with self._sem:
                 try:
-                    await self._check_user_balance(user)
+                    changed = await self._check_user_balance(user)
                 except Exception as e:
                     logger.error(f"Error checking balance for user {user.id}: {e}")
+                finally:
+                    self._scheduler.reschedule(user.id, changed)
+        
+        await asyncio.gather(*(_check_one(user) for user in users))
     
-    async def _check_user_balance(self, user):
-        """Проверить баланс конкретного пользователя"""
-        async with CloreAPIClient(user.clore_api_key) as client:
-            # Получаем балансы
+    async def _load_users(self) -> Dict[int, Any]:
+        """Загрузить активных пользователей"""
+        async with get_db() as db:
+            return {user.id: user for user in await get_active_users(db)}
+    
+    async def _reload_users(self, user_ids, now: float) -> List[Any]:
+        """Перечитать пользователей перед проверкой: ключ или настройки могли измениться"""
+        try:
+            async with get_db() as db:
+                users = await get_users_by_ids(db, user_ids)
+        except Exception as e:
+            # Без пользователей проверку пропускаем, но из расписания не теряем
+            logger.error(f"Error reloading users for check: {e}")
+            users = {}
+        
+        fresh = []
+        for user_id in user_ids:
+            user = users.get(user_id)
+            if user is not None and user.is_active and user.clore_api_key:
+                fresh.append(user)
+            else:
+                # Отключенных забудет ближайший sync, до тех пор держим их в расписании
+                self._scheduler.reschedule(user_id, False, now)
+        return fresh
+    
+    async def _check_user_balance(self, user) -> bool:
+        """Проверить баланс конкретного пользователя. Возвращает True, если баланс изменился"""
+        # Получаем балансы
+        async with lease(user.clore_api_key) as client:
             wallets_data = await client.get_wallets()
-            wallets = wallets_data.get('wallets', [])
+        wallets = wallets_data.get('wallets', [])
+        
+        clore_balance = 0
+        btc_balance = 0
+        total_usd = 0
+        
+        for wallet in wallets:
+            name = wallet.get('name', '')
+            balance = wallet.get('balance', 0)
             
-            clore_balance = 0
-            btc_balance = 0
-            total_usd = 0
+            if name == 'CLORE-Blockchain':
+                clore_balance = balance
+                total_usd += balance * settings.clore_to_usd
+            elif name == 'bitcoin':
+                btc_balance = balance
+                total_usd += balance * settings.btc_to_usd
+        
+        # Сохраняем снимок
+        async with get_db() as db:
+            await save_balance_snapshot(
+                db,
+                user_id=user.id,
+                clore_balance=clore_balance,
+                btc_balance=btc_balance,
+                usd_equivalent=total_usd
+            )
             
-            for wallet in wallets:
-                name = wallet.get('name', '')
-                balance = wallet.get('balance', 0)
-                
-                if name == 'CLORE-Blockchain':
-                    clore_balance = balance
-                    total_usd += balance * settings.clore_to_usd
-                elif name == 'bitcoin':
-                    btc_balance = balance
-                    total_usd += balance * settings.btc_to_usd
+            # Проверяем пороговое значение
+            if user.alert_balance_threshold and total_usd < user.alert_balance_threshold:
+                await self._create_low_balance_alert(db, user, total_usd)
             
-            # Сохраняем снимок
-            async with get_db() as db:
-                await save_balance_snapshot(
-                    db,
-                    user_id=user.id,
-                    clore_balance=clore_balance,
-                    btc_balance=btc_balance,
-                    usd_equivalent=total_usd
-                )
-                
-                # Проверяем пороговое значение
-                if user.alert_balance_threshold and total_usd < user.alert_balance_threshold:
-                    await self._create_low_balance_alert(db, user, total_usd)
-                
-                # Проверяем резкое падение баланса
-                await self._check_balance_drop(db, user, clore_balance)
+            # Проверяем резкое падение баланса
+            await self._check_balance_drop(db, user, clore_balance)
+        
+        balances = (clore_balance, btc_balance)
+        changed = self._last_balances.get(user.id) != balances
+        self._last_balances[user.id] = balances
+        return changed
     
     async def _create_low_balance_alert(self, db, user, current_balance_usd):
         """Создать алерт о низком балансе"""
@@ -0,0 +1,78 @@
+"""
+Общий пул клиентов Clore API для сервисов мониторинга
+"""
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Set
+from loguru import logger
+
+from clore_api.client import CloreAPIClient
+
+
+# Один клиент на API ключ - соединения и TLS сессии живут между циклами.
+# Пул ограничен: клиенты давно не использованных ключей закрываются
+_MAX_CLIENTS = 1024
+_clients: "OrderedDict[str, CloreAPIClient]" = OrderedDict()
+
+# Клиенты, выданные через lease(), и число активных использований.
+# Вытесненный клиент в работе закрывается после последнего использования
+_in_use: Dict[CloreAPIClient, int] = {}
+_retired: Set[CloreAPIClient] = set()
+
+
+@asynccontextmanager
+async def lease(api_key: str):
+    """Клиент для API ключа; не закрывается, пока используется"""
+    client = _clients.get(api_key)
+    if client is not None:
+        _clients.move_to_end(api_key)
+    else:
+        client = CloreAPIClient(api_key)
+        _clients[api_key] = client
+    
+    # Счетчик увеличиваем до первого await, чтобы клиент не успели закрыть
+    _in_use[client] = _in_use.get(client, 0) + 1
+    try:
+        while len(_clients) > _MAX_CLIENTS:
+            _, stale = _clients.popitem(last=False)
+            await _retire(stale)
+        yield client
+    finally:
+        _in_use[client] -= 1
+        if not _in_use[client]:
+            del _in_use[client]
+            if client in _retired:
+                _retired.discard(client)
+                await _close(client)
+
+
+async def evict(api_key: str):
+    """Закрыть клиент ключа, который заменили или отозвали"""
+    client = _clients.pop(api_key, None)
+    if client is not None:
+        await _retire(client)
+
+
+async def close_all():
+    """Закрыть все клиенты пула"""
+    clients = set(_clients.values()) | _retired
+    _clients.clear()
+    _retired.clear()
+    
+    for client in clients:
+        await _close(client)
+
+
+async def _retire(client: CloreAPIClient):
+    """Закрыть клиент сейчас или отложить до конца его использования"""
+    if client in _in_use:
+        _retired.add(client)
+    else:
+        await _close(client)
+
+
+async def _close(client: CloreAPIClient):
+    try:
+        await client.close()
+    except Exception as e:
+        logger.error(f"Error closing Clore API client: {e}")
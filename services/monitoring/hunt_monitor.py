@@ -2,18 +2,36 @@
 Сервис охоты на серверы
 """
 import asyncio
+import heapq
+import re
+from bisect import bisect_right
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from loguru import logger
 
 from config import settings
 from database.session import get_db
 from database.crud import (
-    get_active_hunt_tasks, create_alert, 
-    get_docker_templates, save_order
+    get_active_hunt_tasks, get_users_by_ids, create_alert, 
+    get_docker_templates, save_order,
+    update_hunt_task_status
 )
 from database.models import HuntTask, HuntResult
 from clore_api.client import CloreAPIClient
+from services.monitoring.client_pool import lease
+from services.monitoring.marketplace_cache import get_marketplace
+from utils.ttl_cache import TTLCache
+
+
+_GPU_COUNT_RE = re.compile(r'^\s*(\d+)\s*x', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def _compile_gpu_models(models: tuple) -> re.Pattern:
+    """Скомпилировать список моделей GPU задачи в одно регулярное выражение"""
+    return re.compile('|'.join(re.escape(model.upper()) for model in models))
 
 
 class HuntMonitor:
@@ -22,7 +40,12 @@ class HuntMonitor:
     def __init__(self):
         self.running = False
         self.check_interval = 30  # Проверка каждые 30 секунд
-        self.found_servers = {}  # Кеш найденных серверов
+        # Кеш найденных серверов: повторно не уведомляем в течение часа
+        self.found_servers = TTLCache(maxsize=100_000, ttl=3600)
+        self._sem = asyncio.Semaphore(settings.max_concurrent_api or 10)
+        self.marketplace_ttl = 20  # Время жизни общего снимка маркетплейса, секунд
+        self._index: Dict[str, Any] = {}  # Индекс текущего снимка маркетплейса
+        self._index_source: Optional[List[Dict]] = None
     
     async def start(self):
         """Запустить охоту"""
@@ -46,32 +69,33 @@ class HuntMonitor:
         """Обработать все активные задачи охоты"""
         async with get_db() as db:
             tasks = await get_active_hunt_tasks(db)
+            # Владельцев всех задач загружаем одним запросом
+            users = await get_users_by_ids(db, {task.user_id for task in tasks})
             
-            for task in tasks:
-                try:
-                    await self._process_single_task(task)
-                except Exception as e:
-                    logger.error(f"Error processing hunt task {task.id}: {e}")
+            async def _process_one(task):
+                async with self._sem:
+                    try:
+                        await self._process_single_task(task, users.get(task.user_id))
+                    except Exception as e:
+                        logger.error(f"Error processing hunt task {task.id}: {e}")
+            
+            await asyncio.gather(*(_process_one(task) for task in tasks))
     
-    async def _process_single_task(self, task: HuntTask):
+    async def _process_single_task(self, task: HuntTask, user):
         """Обработать одну задачу охоты"""
-        # Получаем пользователя и его API ключ
-        async with get_db() as db:
-            user = await db.get(type(task.user), task.user_id)
-            
-            if not user or not user.clore_api_key:
-                logger.warning(f"User {task.user_id} has no API key")
-                return
+        # Проверяем API ключ пользователя
+        if not user or not user.clore_api_key:
+            logger.warning(f"User {task.user_id} has no API key")
+            return
         
-        # Создаем клиент API
-        async with CloreAPIClient(user.clore_api_key) as client:
-            # Получаем список серверов
-            marketplace_data = await client.get_marketplace()
-            servers = marketplace_data.get('servers', [])
+        # Клиент API из общего пула
+        async with lease(user.clore_api_key) as client:
+            # Получаем список серверов (один запрос на цикл для всех задач)
+            servers = await get_marketplace(client, ttl=self.marketplace_ttl)
             
-            # Фильтруем по критериям
+            # Фильтруем по критериям через индекс снимка
             matching_servers = self._filter_servers_by_criteria(
-                servers, 
+                self._get_marketplace_index(servers), 
                 task.filters
             )
             
@@ -83,85 +107,133 @@ class HuntMonitor:
                 client, task, user, matching_servers
             )
     
-    def _filter_servers_by_criteria(
-        self, 
-        servers: List[Dict], 
-        criteria: Dict[str, Any]
-    ) -> List[Dict]:
-        """Фильтровать серверы по критериям охоты"""
-        filtered = []
+    def _build_marketplace_index(self, servers: List[Dict]) -> Dict[str, Any]:
+        """
+        Построить индексы маркетплейса один раз на снимок.
+        Поля каждого сервера разбираются один раз в server['_parsed'],
+        а GPU, страна и цена за GPU индексируются для пересечения множеств.
+        """
+        index = {'servers': [], 'by_gpu': {}, 'by_country': {}, 'by_price': []}
         
         for server in servers:
-            # Пропускаем арендованные
+            # Арендованные серверы в индекс не попадают
             if server.get('rented'):
                 continue
             
-            # Проверяем все критерии
-            if not self._server_matches_criteria(server, criteria):
-                continue
+            parsed = server.get('_parsed')
+            if parsed is None:
+                parsed = server['_parsed'] = self._parse_server(server)
             
-            filtered.append(server)
+            pos = len(index['servers'])
+            index['servers'].append(server)
+            index['by_gpu'].setdefault(parsed['gpu_upper'], set()).add(pos)
+            index['by_country'].setdefault(parsed['cc'], set()).add(pos)
+            if parsed['price_per_gpu'] is not None:
+                index['by_price'].append((parsed['price_per_gpu'], pos))
         
-        return filtered
+        index['by_price'].sort()
+        return index
     
-    def _server_matches_criteria(
+    @staticmethod
+    def _parse_server(server: Dict) -> Dict[str, Any]:
+        """Разобрать поля сервера, используемые фильтрами охоты"""
+        specs = server.get('specs') or {}
+        gpu_str = specs.get('gpu', '')
+        price, _ = CloreAPIClient.extract_server_price(server)
+        
+        # Количество GPU из префикса вида "4x ..."; без префикса считаем одну
+        match = _GPU_COUNT_RE.match(gpu_str)
+        gpu_count = int(match.group(1)) if match else 1
+        
+        if price is None:
+            price_per_gpu = None
+        else:
+            price_per_gpu = price / gpu_count if gpu_count > 0 else 0
+        
+        return {
+            'price': price,
+            'gpu_count': gpu_count,
+            'price_per_gpu': price_per_gpu,
+            'gpu_upper': gpu_str.upper(),
+            'ram': specs.get('ram', 0),
+            'cc': (specs.get('net') or {}).get('cc', ''),
+            'rating': (server.get('rating') or {}).get('avg', 0)
+        }
+    
+    def _get_marketplace_index(self, servers: List[Dict]) -> Dict[str, Any]:
+        """Получить индекс для текущего снимка маркетплейса"""
+        # Снимок общий на цикл, поэтому индекс перестраивается только при его смене
+        if self._index_source is not servers:
+            self._index = self._build_marketplace_index(servers)
+            self._index_source = servers
+        return self._index
+    
+    def _filter_servers_by_criteria(
         self, 
-        server: Dict, 
+        index: Dict[str, Any], 
         criteria: Dict[str, Any]
-    ) -> bool:
-        """Проверить, соответствует ли сервер критериям"""
-        specs = server.get('specs', {})
+    ) -> List[Dict]:
+        """Фильтровать серверы по критериям охоты"""
+        candidates = None
         
-        # GPU модель
-        if 'gpu_models' in criteria and criteria['gpu_models']:
-            gpu_str = specs.get('gpu', '').upper()
-            if not any(model.upper() in gpu_str for model in criteria['gpu_models']):
-                return False
+        # GPU модель: проверяем уникальные строки GPU, а не каждый сервер
+        if criteria.get('gpu_models'):
+            gpu_re = _compile_gpu_models(tuple(criteria['gpu_models']))
+            candidates = set()
+            for gpu_upper, positions in index['by_gpu'].items():
+                if gpu_re.search(gpu_upper):
+                    candidates |= positions
+        
+        # Локация
+        if criteria.get('locations'):
+            by_country = set()
+            for cc in criteria['locations']:
+                by_country |= index['by_country'].get(cc, set())
+            candidates = by_country if candidates is None else candidates & by_country
         
-        # Максимальная цена за GPU
+        # Максимальная цена за GPU: префикс отсортированного списка
         if 'max_price_per_gpu' in criteria:
-            from clore_api.client import CloreAPIClient
-            client = CloreAPIClient("")
-            
-            price, _ = client.extract_server_price(server)
-            if price is None:
-                return False
-            
-            gpu_count, _ = client.extract_gpu_info(specs.get('gpu', ''))
-            if gpu_count > 0:
-                price_per_gpu = price / gpu_count
-                if price_per_gpu > criteria['max_price_per_gpu']:
-                    return False
+            by_price = index['by_price']
+            cut = bisect_right(by_price, (criteria['max_price_per_gpu'], float('inf')))
+            cheap = {pos for _, pos in by_price[:cut]}
+            candidates = cheap if candidates is None else candidates & cheap
+        
+        if candidates is None:
+            candidates = range(len(index['servers']))
+        
+        # Оставшиеся критерии проверяем только на выжившем подмножестве
+        servers = index['servers']
+        return [
+            servers[pos]
+            for pos in sorted(candidates)
+            if self._server_matches_criteria(servers[pos], criteria)
+        ]
+    
+    def _server_matches_criteria(
+        self, 
+        server: Dict, 
+        criteria: Dict[str, Any]
+    ) -> bool:
+        """Проверить неиндексируемые критерии по разобранным полям сервера"""
+        parsed = server['_parsed']
         
         # Количество GPU
         if 'min_gpu_count' in criteria:
-            gpu_str = specs.get('gpu', '')
-            count = int(gpu_str.split('x')[0]) if 'x' in gpu_str else 1
-            if count < criteria['min_gpu_count']:
+            if parsed['gpu_count'] < criteria['min_gpu_count']:
                 return False
         
         if 'max_gpu_count' in criteria:
-            gpu_str = specs.get('gpu', '')
-            count = int(gpu_str.split('x')[0]) if 'x' in gpu_str else 1
-            if count > criteria['max_gpu_count']:
+            if parsed['gpu_count'] > criteria['max_gpu_count']:
                 return False
         
         # RAM
         if 'min_ram_gb' in criteria:
-            ram = specs.get('ram', 0)
-            if ram < criteria['min_ram_gb']:
-                return False
-        
-        # Локация
-        if 'locations' in criteria and criteria['locations']:
-            location = specs.get('net', {}).get('cc', '')
-            if location not in criteria['locations']:
+            if parsed['ram'] < criteria['min_ram_gb']:
                 return False
         
         # Рейтинг
         if 'min_rating' in criteria:
-            rating = server.get('rating', {}).get('avg', 0)
-            if rating < criteria['min_rating']:
+            if parsed['rating'] < criteria['min_rating']:
                 return False
         
         return True
@@ -178,23 +250,34 @@ class HuntMonitor:
         if task.servers_rented >= task.max_servers:
             return
         
-        # Сортируем по цене
-        servers.sort(
-            key=lambda s: client.extract_server_price(s)[0] or float('inf')
-        )
+        # Время берем один раз на всю пачку
+        now_mono = time.monotonic()
+        found_at = datetime.utcnow()
         
-        for server in servers:
-            server_id = server['id']
-            
-            # Проверяем, не обрабатывали ли мы уже этот сервер
-            cache_key = f"{task.id}:{server_id}"
-            if cache_key in self.found_servers:
-                last_found = self.found_servers[cache_key]
-                if datetime.now() - last_found < timedelta(hours=1):
-                    continue
+        # Пропускаем уже обработанные серверы
+        found_servers = self.found_servers
+        fresh = [
+            server for server in servers
+            if found_servers.get(f"{task.id}:{server['id']}", now=now_mono) is None
+        ]
+        
+        def price_key(server):
+            return server['_parsed']['price'] or float('inf')
+        
+        if task.auto_rent:
+            # Арендуем только самые дешевые в пределах оставшегося лимита
+            candidates = heapq.nsmallest(
+                task.max_servers - task.servers_rented, fresh, key=price_key
+            )
+        else:
+            # Без автоаренды лимит не расходуется - уведомляем обо всех находках
+            candidates = sorted(fresh, key=price_key)
+        
+        for server in candidates:
+            cache_key = f"{task.id}:{server['id']}"
             
             # Сохраняем в кеш
-            self.found_servers[cache_key] = datetime.now()
+            found_servers.set(cache_key, now_mono, now=now_mono)
             
             # Создаем алерт о находке
             async with get_db() as db:
@@ -202,7 +285,7 @@ class HuntMonitor:
                 
                 # Обновляем статистику
                 task.servers_found += 1
-                task.last_found_at = datetime.utcnow()
+                task.last_found_at = found_at
                 await db.commit()
             
             # Если включена автоаренда
@@ -217,6 +300,8 @@ class HuntMonitor:
                     # Проверяем лимит
                     if task.servers_rented >= task.max_servers:
                         task.is_active = False
+                        async with get_db() as db:
+                            await update_hunt_task_status(db, task.id, is_active=False)
                         logger.info(f"Hunt task {task.id} reached limit")
                         break
     
@@ -229,7 +314,7 @@ class HuntMonitor:
     ):
         """Создать уведомление о найденном сервере"""
         gpu = server.get('specs', {}).get('gpu', 'Unknown')
-        price, _ = CloreAPIClient("").extract_server_price(server)
+        price = server['_parsed']['price']
         
         message = (
             f"🎯 Найден сервер по задаче '{task.name}':\n"
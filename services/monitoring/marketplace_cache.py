@@ -0,0 +1,27 @@
+"""
+Общий кеш маркетплейса Clore для сервисов мониторинга
+"""
+import asyncio
+import time
+from typing import List, Dict, Optional
+
+from clore_api.client import CloreAPIClient
+
+
+# Маркетплейс одинаков для всех пользователей, поэтому храним один снимок
+_servers: Optional[List[Dict]] = None
+_fetched_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def get_marketplace(client: CloreAPIClient, ttl: float = 20) -> List[Dict]:
+    """Получить список серверов маркетплейса из кеша или обновить его"""
+    global _servers, _fetched_at
+    
+    async with _lock:
+        now = time.monotonic()
+        if _servers is None or now - _fetched_at >= ttl:
+            marketplace_data = await client.get_marketplace()
+            _servers = marketplace_data.get('servers', [])
+            _fetched_at = now
+        return _servers
@@ -0,0 +1,87 @@
+"""
+Планировщик проверок пользователей по дедлайнам
+"""
+import heapq
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class UserScheduler:
+    """
+    Куча дедлайнов (next_due, user_id) для мониторов.
+    Проверки разнесены во времени со случайным сдвигом; интервал растет,
+    пока данные пользователя не меняются, и сбрасывается при изменении.
+    """
+
+    def __init__(
+        self,
+        base_interval: float,
+        max_interval: Optional[float] = None,
+        backoff: float = 1.5,
+        jitter: float = 0.1
+    ):
+        self.base_interval = base_interval
+        self.max_interval = max_interval or base_interval * 4
+        self.backoff = backoff
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}  # Актуальный дедлайн пользователя
+        self._intervals: Dict[int, float] = {}  # Текущий интервал пользователя
+
+    def sync(self, user_ids: Iterable[int], now: Optional[float] = None):
+        """Добавить новых пользователей и забыть отсутствующих"""
+        now = time.monotonic() if now is None else now
+        user_ids = set(user_ids)
+
+        for user_id in user_ids - self._intervals.keys():
+            self._intervals[user_id] = self.base_interval
+            # Первую проверку размазываем по интервалу, чтобы не было всплеска
+            self._push(user_id, now + random.uniform(0, self.base_interval))
+
+        # Записи в куче удаляются лениво: без дедлайна они пропускаются
+        for user_id in self._intervals.keys() - user_ids:
+            del self._intervals[user_id]
+            self._due.pop(user_id, None)
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """Извлечь пользователей, чей дедлайн наступил"""
+        now = time.monotonic() if now is None else now
+        due = []
+
+        while self._heap and self._heap[0][0] <= now:
+            due_at, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) == due_at:
+                del self._due[user_id]
+                due.append(user_id)
+
+        return due
+
+    def reschedule(self, user_id: int, changed: bool, now: Optional[float] = None):
+        """Запланировать следующую проверку после завершения текущей"""
+        interval = self._intervals.get(user_id)
+        if interval is None:
+            return
+
+        if changed:
+            interval = self.base_interval
+        else:
+            interval = min(interval * self.backoff, self.max_interval)
+        self._intervals[user_id] = interval
+
+        now = time.monotonic() if now is None else now
+        self._push(
+            user_id,
+            now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        )
+
+    def next_due(self) -> Optional[float]:
+        """Ближайший актуальный дедлайн"""
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def _push(self, user_id: int, due_at: float):
+        self._due[user_id] = due_at
+        heapq.heappush(self._heap, (due_at, user_id))
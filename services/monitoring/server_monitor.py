@@ -2,16 +2,28 @@
 Мониторинг серверов и ордеров
 """
 import asyncio
-from datetime import datetime, timedelta
+import re
+import time
+from typing import Dict, Any, List, Optional
 from loguru import logger
 
 from config import settings
 from database.session import get_db
 from database.crud import (
-    get_active_users, get_active_orders, update_order_status,
-    save_server_snapshot, create_alert, save_order
+    get_active_users, get_users_by_ids, get_active_orders, expire_missing_orders,
+    save_server_snapshots_bulk, save_orders_bulk, update_orders_spent_bulk,
+    create_alerts_bulk
 )
 from clore_api.client import CloreAPIClient
+from services.monitoring.client_pool import lease
+from services.monitoring.scheduler import UserScheduler
+from services.monitoring.marketplace_cache import get_marketplace
+from utils.ttl_cache import TTLCache
+
+
+# GPU, снимки которых сохраняются для аналитики маркетплейса
+INTERESTING_GPUS = ('4090', '3090', '3080', 'A100', 'H100')
+_GPU_RE = re.compile('|'.join(map(re.escape, INTERESTING_GPUS)), re.IGNORECASE)
 
 
 class ServerMonitor:
@@ -20,47 +32,116 @@ class ServerMonitor:
     def __init__(self):
         self.running = False
         self.check_interval = settings.server_check_interval
+        self._sem = asyncio.Semaphore(settings.max_concurrent_api or 10)
+        # Пользователи проверяются по своим дедлайнам, а не все разом
+        self._scheduler = UserScheduler(self.check_interval)
+        # Отправленные предупреждения об истечении: не чаще раза в час на заказ
+        self._alert_dedupe = TTLCache(maxsize=50_000, ttl=3600)
+        self._snapshot_task: Optional[asyncio.Task] = None
     
     async def start(self):
         """Запустить мониторинг"""
         self.running = True
         logger.info("Server monitor started")
         
-        while self.running:
-            try:
-                await self._check_all_servers()
-            except Exception as e:
-                logger.error(f"Error in server monitor: {e}")
+        # Снимки маркетплейса пишутся отдельной задачей раз в час
+        self._snapshot_task = asyncio.create_task(self._hourly_snapshot_loop())
+        
+        try:
+            users = {}
+            next_refresh = 0.0
             
-            await asyncio.sleep(self.check_interval)
+            while self.running:
+                now = time.monotonic()
+                try:
+                    # Список пользователей обновляем раз в базовый интервал
+                    if now >= next_refresh:
+                        users = await self._load_users()
+                        self._scheduler.sync(users, now)
+                        next_refresh = now + self.check_interval
+                    
+                    due_ids = self._scheduler.pop_due(now)
+                    if due_ids:
+                        await self._check_all_servers(await self._reload_users(due_ids, now))
+                except Exception as e:
+                    logger.error(f"Error in server monitor: {e}")
+                
+                # Спим до ближайшего дедлайна или обновления списка
+                next_due = self._scheduler.next_due()
+                wake_at = next_refresh if next_due is None else min(next_due, next_refresh)
+                await asyncio.sleep(max(wake_at - time.monotonic(), 1.0))
+        finally:
+            # Задача снимков не должна пережить основной цикл (например, при отмене start)
+            await self._cancel_snapshot_task()
     
     async def stop(self):
         """Остановить мониторинг"""
         self.running = False
+        await self._cancel_snapshot_task()
         logger.info("Server monitor stopped")
     
-    async def _check_all_servers(self):
-        """Проверить серверы всех пользователей"""
-        async with get_db() as db:
-            users = await get_active_users(db)
-            
-            for user in users:
+    async def _cancel_snapshot_task(self):
+        """Отменить задачу часовых снимков и дождаться ее завершения"""
+        task, self._snapshot_task = self._snapshot_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    
+    async def _check_all_servers(self, users):
+        """Проверить серверы пользователей, чей срок проверки наступил"""
+        async def _check_one(user):
+            changed = False
+            async with self._sem:
                 try:
-                    await self._check_user_servers(user)
+                    changed = await self._check_user_servers(user)
                 except Exception as e:
                     logger.error(f"Error checking servers for user {user.id}: {e}")
+                finally:
+                    self._scheduler.reschedule(user.id, changed)
+        
+        await asyncio.gather(*(_check_one(user) for user in users))
     
-    async def _check_user_servers(self, user):
-        """Проверить серверы и ордера пользователя"""
-        async with CloreAPIClient(user.clore_api_key) as client:
-            # Проверяем мои серверы (которые пользователь сдает)
-            await self._check_my_servers(client, user)
-            
-            # Проверяем активные ордера (аренды)
-            await self._check_active_orders(client, user)
-            
-            # Сохраняем снимки маркетплейса для аналитики
-            await self._save_marketplace_snapshot(client, user)
+    async def _load_users(self) -> Dict[int, Any]:
+        """Загрузить активных пользователей"""
+        async with get_db() as db:
+            return {user.id: user for user in await get_active_users(db)}
+    
+    async def _reload_users(self, user_ids, now: float) -> List[Any]:
+        """Перечитать пользователей перед проверкой: ключ или настройки могли измениться"""
+        try:
+            async with get_db() as db:
+                users = await get_users_by_ids(db, user_ids)
+        except Exception as e:
+            # Без пользователей проверку пропускаем, но из расписания не теряем
+            logger.error(f"Error reloading users for check: {e}")
+            users = {}
+        
+        fresh = []
+        for user_id in user_ids:
+            user = users.get(user_id)
+            if user is not None and user.is_active and user.clore_api_key:
+                fresh.append(user)
+            else:
+                # Отключенных забудет ближайший sync, до тех пор держим их в расписании
+                self._scheduler.reschedule(user_id, False, now)
+        return fresh
+    
+    async def _check_user_servers(self, user) -> bool:
+        """Проверить серверы и ордера пользователя. Возвращает True, если ордера изменились"""
+        async with lease(user.clore_api_key) as client:
+            # Проверки независимы - запускаем одновременно
+            _, orders_changed = await asyncio.gather(
+                # Мои серверы (которые пользователь сдает)
+                self._check_my_servers(client, user),
+                # Активные ордера (аренды)
+                self._check_active_orders(client, user),
+                return_exceptions=True
+            )
+        return orders_changed is True
     
     async def _check_my_servers(self, client: CloreAPIClient, user):
         """Проверить серверы пользователя"""
@@ -72,20 +153,23 @@ class ServerMonitor:
                 for server in servers:
                     # Проверяем изменение статуса
                     await self._check_server_status_change(db, user, server)
-                    
-                    # Сохраняем снимок
-                    if server.get('connected') and server.get('specs'):
-                        await save_server_snapshot(
-                            db,
-                            user_id=user.id,
-                            server_data=server,
-                            snapshot_type='my_server'
-                        )
+                
+                # Снимки подключенных серверов сохраняем одним INSERT
+                await save_server_snapshots_bulk(
+                    db,
+                    user_id=user.id,
+                    servers=[
+                        server for server in servers
+                        if server.get('connected') and server.get('specs')
+                    ],
+                    snapshot_type='my_server'
+                )
         except Exception as e:
             logger.error(f"Error checking my servers: {e}")
     
-    async def _check_active_orders(self, client: CloreAPIClient, user):
-        """Проверить активные ордера"""
+    async def _check_active_orders(self, client: CloreAPIClient, user) -> bool:
+        """Проверить активные ордера. Возвращает True, если появились новые или завершенные"""
+        changed = False
         try:
             orders_data = await client.get_my_orders(return_completed=False)
             api_orders = orders_data.get('orders', [])
@@ -95,46 +179,59 @@ class ServerMonitor:
                 db_orders = await get_active_orders(db, user.id)
                 db_order_ids = {order.clore_order_id for order in db_orders}
                 
-                # Проверяем новые ордера
+                # Изменения копим за проход и пишем пачками
+                new_orders = []
+                spent = {}
+                alerts = []
+                expiring_keys = []
+                
                 for api_order in api_orders:
                     order_id = api_order.get('id')
                     
                     if order_id not in db_order_ids:
-                        # Новый ордер - сохраняем
-                        await save_order(db, user.id, api_order)
+                        # Новый ордер
+                        new_orders.append(api_order)
                     else:
-                        # Обновляем существующий
-                        await update_order_status(
-                            db,
-                            clore_order_id=order_id,
-                            status='active',
-                            total_spent=api_order.get('spend', 0)
-                        )
+                        # Существующий - обновим потраченную сумму
+                        spent[order_id] = api_order.get('spend', 0)
                     
                     # Проверяем истечение срока
-                    await self._check_order_expiry(db, user, api_order)
+                    alert = self._check_order_expiry(user, api_order)
+                    if alert:
+                        alerts.append(alert)
+                        expiring_keys.append((user.id, order_id, 'order_expiring'))
                 
-                # Проверяем завершенные ордера
-                api_order_ids = {o.get('id') for o in api_orders}
-                for db_order in db_orders:
-                    if db_order.clore_order_id not in api_order_ids:
-                        # Ордер больше не активен
-                        await update_order_status(
-                            db,
-                            clore_order_id=db_order.clore_order_id,
-                            status='expired'
-                        )
-                        
-                        await create_alert(
-                            db,
+                if new_orders:
+                    changed = True
+                    await save_orders_bulk(db, user.id, new_orders)
+                await update_orders_spent_bulk(db, spent)
+                
+                # Завершенные ордера помечаем одним UPDATE на стороне БД
+                expired_ids = await expire_missing_orders(
+                    db, user.id, {o.get('id') for o in api_orders}
+                )
+                if expired_ids:
+                    changed = True
+                    alerts.extend(
+                        dict(
                             user_id=user.id,
                             alert_type='order_expired',
                             title='⏰ Аренда завершена',
-                            message=f'Заказ #{db_order.clore_order_id} завершен'
+                            message=f'Заказ #{order_id} завершен'
                         )
+                        for order_id in expired_ids
+                    )
+                
+                await create_alerts_bulk(db, alerts)
+                
+                # Отмечаем отправленные предупреждения только после записи
+                for key in expiring_keys:
+                    self._alert_dedupe[key] = True
         
         except Exception as e:
             logger.error(f"Error checking active orders: {e}")
+        
+        return changed
     
     async def _check_server_status_change(self, db, user, server):
         """Проверить изменение статуса сервера"""
@@ -142,57 +239,72 @@ class ServerMonitor:
         # Нужно хранить предыдущее состояние и сравнивать
         pass
     
-    async def _check_order_expiry(self, db, user, order):
-        """Проверить истечение срока аренды"""
+    def _check_order_expiry(self, user, order) -> Optional[Dict[str, Any]]:
+        """Проверить истечение срока аренды. Возвращает строку алерта или None"""
         mrl = order.get('mrl', 0)  # максимальное время аренды в секундах
         created_at = order.get('ct', 0)
         
         if not mrl or not created_at:
-            return
+            return None
         
-        expires_at = datetime.fromtimestamp(created_at + mrl)
-        time_left = expires_at - datetime.now()
-        hours_left = time_left.total_seconds() / 3600
+        # Считаем в секундах эпохи, без создания datetime на каждый заказ
+        hours_left = (created_at + mrl - time.time()) / 3600.0
         
         # Предупреждаем если осталось меньше порогового значения
         if 0 < hours_left <= user.alert_rental_expiry_hours:
             # Проверяем, не отправляли ли мы уже алерт
-            # TODO: Добавить проверку на дубликаты алертов
+            dedupe_key = (user.id, order.get('id'), 'order_expiring')
+            if dedupe_key in self._alert_dedupe:
+                return None
             
-            await create_alert(
-                db,
+            return dict(
                 user_id=user.id,
                 alert_type='order_expiring',
                 title='⏳ Аренда скоро закончится',
                 message=f'Заказ #{order.get("id")} истекает через {hours_left:.1f} часов'
             )
+        
+        return None
+    
+    async def _hourly_snapshot_loop(self):
+        """Сохранять снимок маркетплейса в начале каждого часа"""
+        while self.running:
+            # Спим до начала следующего часа
+            now = time.time()
+            await asyncio.sleep(3600 - now % 3600)
+            
+            try:
+                async with get_db() as db:
+                    users = await get_active_users(db)
+                if not users:
+                    continue
+                
+                # Маркетплейс общий: один снимок на всех, от имени первого пользователя
+                user = users[0]
+                async with lease(user.clore_api_key) as client:
+                    await self._save_marketplace_snapshot(client, user)
+            except Exception as e:
+                logger.error(f"Error in hourly snapshot loop: {e}")
     
     async def _save_marketplace_snapshot(self, client: CloreAPIClient, user):
         """Сохранить снимок маркетплейса для аналитики"""
         try:
-            # Сохраняем снимки только раз в час
-            current_minute = datetime.now().minute
-            if current_minute != 0:  # Только в начале часа
-                return
-            
-            marketplace_data = await client.get_marketplace()
-            servers = marketplace_data.get('servers', [])
+            # Общий с HuntMonitor снимок - без повторного запроса
+            servers = await get_marketplace(client)
             
             # Сохраняем только интересные серверы (например, с нужными GPU)
-            interesting_gpus = ['4090', '3090', '3080', 'A100', 'H100']
+            interesting = [
+                server for server in servers
+                if _GPU_RE.search(server.get('specs', {}).get('gpu', ''))
+            ]
             
             async with get_db() as db:
-                for server in servers:
-                    gpu_str = server.get('specs', {}).get('gpu', '')
-                    
-                    # Проверяем, интересен ли нам этот сервер
-                    if any(gpu in gpu_str for gpu in interesting_gpus):
-                        await save_server_snapshot(
-                            db,
-                            user_id=user.id,
-                            server_data=server,
-                            snapshot_type='marketplace'
-                        )
+                await save_server_snapshots_bulk(
+                    db,
+                    user_id=user.id,
+                    servers=interesting,
+                    snapshot_type='marketplace'
+                )
         
         except Exception as e:
-            logger.error(f"Error saving marketplace snapshot: {e}")
\ No newline at end of file
+            logger.error(f"Error saving marketplace snapshot: {e}")
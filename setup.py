@@ -5,13 +5,78 @@
 import os
 import sys
 import asyncio
+import argparse
 from pathlib import Path
 from getpass import getpass
 import secrets
 
 
-async def main():
+# Параметры, которые можно передать без интерактивного ввода:
+# аргументом --ключ или переменной окружения SETUP_<КЛЮЧ>
+SETUP_OPTIONS = {
+    'BOT_TOKEN': "Токен бота от @BotFather",
+    'BOT_USERNAME': "Имя бота без @",
+    'OPENAI_API_KEY': "Ключ OpenAI API",
+    'OPENAI_MODEL': "Модель OpenAI",
+    'DB_URL': "Готовый DATABASE_URL (вместо вопросов о БД)",
+    'DB_TYPE': "Тип БД: sqlite или postgresql",
+    'DB_HOST': "Хост PostgreSQL",
+    'DB_PORT': "Порт PostgreSQL",
+    'DB_NAME': "Имя базы PostgreSQL",
+    'DB_USER': "Пользователь PostgreSQL",
+    'DB_PASS': "Пароль PostgreSQL",
+    'ADMIN_IDS': "Telegram ID админов через запятую",
+    'CLORE_TO_USD': "Курс CLORE/USD",
+    'BTC_TO_USD': "Курс BTC/USD",
+    'OVERWRITE': "Перезаписать существующий .env (y/n)",
+    'INIT_DB': "Инициализировать БД (y/n)",
+    'CREATE_TEMPLATES': "Создать базовые Docker шаблоны (y/n)",
+}
+
+_args = argparse.Namespace(non_interactive=False)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разобрать аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Первоначальная настройка Clore Bot Pro")
+    for key, help_text in SETUP_OPTIONS.items():
+        parser.add_argument(
+            "--" + key.lower().replace('_', '-'),
+            dest=key.lower(),
+            help=help_text
+        )
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        help="Ничего не спрашивать, для пропущенных значений брать значения по умолчанию"
+    )
+    return parser.parse_args(argv)
+
+
+def preset_value(key: str):
+    """Значение из аргумента командной строки или переменной SETUP_<key>, если задано"""
+    value = getattr(_args, key.lower(), None)
+    if value is None:
+        value = os.environ.get("SETUP_" + key)
+    return value
+
+
+def prompt_or_env(key: str, prompt: str, default: str = "", secret: bool = False) -> str:
+    """Взять значение из аргумента, затем из SETUP_<key>, иначе спросить пользователя"""
+    value = preset_value(key)
+    if value is None:
+        if _args.non_interactive:
+            return default
+        value = (getpass if secret else input)(prompt)
+    return value.strip() or default
+
+
+async def main(args: argparse.Namespace = None):
     """Основная функция настройки"""
+    global _args
+    if args is not None:
+        _args = args
+    
     print("🚀 Добро пожаловать в мастер настройки Clore Bot Pro!")
     print("=" * 50)
     
@@ -23,7 +88,7 @@ async def main():
     # Создание .env файла
     env_path = Path(".env")
     if env_path.exists():
-        overwrite = input("\n⚠️  Файл .env уже существует. Перезаписать? (y/N): ")
+        overwrite = prompt_or_env('OVERWRITE', "\n⚠️  Файл .env уже существует. Перезаписать? (y/N): ")
         if overwrite.lower() != 'y':
             print("Настройка отменена.")
             return
@@ -35,37 +100,41 @@ async def main():
     
     # Telegram Bot
     print("\n1. Telegram Bot")
-    config['BOT_TOKEN'] = input("   Bot Token (@BotFather): ").strip()
-    config['BOT_USERNAME'] = input("   Bot Username (без @): ").strip()
+    config['BOT_TOKEN'] = prompt_or_env('BOT_TOKEN', "   Bot Token (@BotFather): ")
+    config['BOT_USERNAME'] = prompt_or_env('BOT_USERNAME', "   Bot Username (без @): ")
     
     # OpenAI
     print("\n2. OpenAI")
-    config['OPENAI_API_KEY'] = getpass("   API Key: ").strip()
-    config['OPENAI_MODEL'] = input("   Model (по умолчанию gpt-4-turbo-preview): ").strip() or "gpt-4-turbo-preview"
+    config['OPENAI_API_KEY'] = prompt_or_env('OPENAI_API_KEY', "   API Key: ", secret=True)
+    config['OPENAI_MODEL'] = prompt_or_env(
+        'OPENAI_MODEL', "   Model (по умолчанию gpt-4-turbo-preview): ", "gpt-4-turbo-preview"
+    )
     
     # База данных
     print("\n3. База данных")
-    db_type = input("   Тип БД (sqlite/postgresql) [sqlite]: ").strip().lower() or "sqlite"
-    
-    if db_type == "postgresql":
-        db_host = input("   Host [localhost]: ").strip() or "localhost"
-        db_port = input("   Port [5432]: ").strip() or "5432"
-        db_name = input("   Database name [clorebot]: ").strip() or "clorebot"
-        db_user = input("   Username [clore]: ").strip() or "clore"
-        db_pass = getpass("   Password: ").strip()
+    db_url = preset_value('DB_URL')
+    
+    if db_url:
+        config['DATABASE_URL'] = db_url.strip()
+    elif prompt_or_env('DB_TYPE', "   Тип БД (sqlite/postgresql) [sqlite]: ", "sqlite").lower() == "postgresql":
+        db_host = prompt_or_env('DB_HOST', "   Host [localhost]: ", "localhost")
+        db_port = prompt_or_env('DB_PORT', "   Port [5432]: ", "5432")
+        db_name = prompt_or_env('DB_NAME', "   Database name [clorebot]: ", "clorebot")
+        db_user = prompt_or_env('DB_USER', "   Username [clore]: ", "clore")
+        db_pass = prompt_or_env('DB_PASS', "   Password: ", secret=True)
         config['DATABASE_URL'] = f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
     else:
         config['DATABASE_URL'] = "sqlite+aiosqlite:///./clore_bot.db"
     
     # Админы
     print("\n4. Администраторы")
-    admin_ids = input("   Telegram ID админов (через запятую): ").strip()
+    admin_ids = prompt_or_env('ADMIN_IDS', "   Telegram ID админов (через запятую): ")
     config['ADMIN_IDS'] = admin_ids
     
     # Курсы валют
     print("\n5. Курсы валют")
-    config['CLORE_TO_USD'] = input("   Курс CLORE/USD [0.02]: ").strip() or "0.02"
-    config['BTC_TO_USD'] = input("   Курс BTC/USD [100000]: ").strip() or "100000"
+    config['CLORE_TO_USD'] = prompt_or_env('CLORE_TO_USD', "   Курс CLORE/USD [0.02]: ", "0.02")
+    config['BTC_TO_USD'] = prompt_or_env('BTC_TO_USD', "   Курс BTC/USD [100000]: ", "100000")
     
     # Дополнительные настройки
     config['CLORE_API_BASE_URL'] = "https://api.clore.ai/v1"
@@ -91,7 +160,7 @@ async def main():
         print(f"   ✓ {dir_name}/")
     
     # Инициализация БД
-    init_db = input("\n🗄️  Инициализировать базу данных? (Y/n): ")
+    init_db = prompt_or_env('INIT_DB', "\n🗄️  Инициализировать базу данных? (Y/n): ")
     if init_db.lower() != 'n':
         print("   Инициализация БД...")
         
@@ -107,7 +176,7 @@ async def main():
             print(f"   ❌ Ошибка: {e}")
     
     # Создание Docker шаблонов
-    create_templates = input("\n🐳 Создать базовые Docker шаблоны? (Y/n): ")
+    create_templates = prompt_or_env('CREATE_TEMPLATES', "\n🐳 Создать базовые Docker шаблоны? (Y/n): ")
     if create_templates.lower() != 'n':
         await create_default_templates()
     
@@ -126,7 +195,7 @@ async def create_default_templates():
     
     try:
         from database.session import get_db
-        from database.crud import create_docker_template
+        from database.crud import create_docker_templates_bulk
         
         templates = [
             {
@@ -156,8 +225,7 @@ async def create_default_templates():
         ]
         
         async with get_db() as db:
-            for template_data in templates:
-                await create_docker_template(db, **template_data)
+            await create_docker_templates_bulk(db, templates)
         
         print(f"   ✅ Создано {len(templates)} шаблонов")
         
@@ -166,4 +234,4 @@ async def create_default_templates():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
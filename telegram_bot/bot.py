@@ -2,28 +2,61 @@
 Основной модуль Telegram бота
 """
 import asyncio
-from typing import Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Optional, TYPE_CHECKING
 from loguru import logger
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from database.session import get_db
 from database.models import User
-from database.crud import get_user_by_telegram_id, create_user, update_user_api_key
-from ai_agent.agent import CloreAIAgent
+from database.crud import get_user_by_telegram_id, create_user, update_user_fields
+from services.monitoring import client_pool
 from telegram_bot.keyboards.inline import (
     get_main_menu_keyboard, 
     get_settings_keyboard,
     get_server_list_keyboard,
     get_confirm_keyboard
 )
-from telegram_bot.middlewares.auth import AuthMiddleware
+from telegram_bot.middlewares import auth_cache
+from telegram_bot.middlewares.auth import create_auth_middleware
+from telegram_bot.storage import ShardedMemoryStorage
+from telegram_bot.strings import (
+    HELP_TEXT,
+    WELCOME_NEW,
+    WELCOME_BACK_FMT,
+    MAIN_MENU,
+    SETTINGS_TITLE,
+    AI_LOADING,
+    PROMPT_API_KEY,
+    PROMPT_SSH_PASSWORD,
+    PROMPT_JUPYTER_TOKEN,
+    API_KEY_SAVED,
+    SSH_PASSWORD_SAVED,
+    JUPYTER_TOKEN_SAVED,
+    PROMPT_SEARCH,
+    HUNT_COMING_SOON,
+    IN_DEVELOPMENT,
+    ERR_NO_API_KEY,
+    ERR_CLORE_TIMEOUT,
+    ERR_API_KEY_CHECK,
+    ERR_TIMEOUT,
+    ERR_SEND,
+    ERR_INTERNAL
+)
+from utils.ttl_cache import TTLCache
+
+if TYPE_CHECKING:
+    from ai_agent.agent import CloreAIAgent
 
 
 class UserStates(StatesGroup):
@@ -40,11 +73,16 @@ class CloreBot:
     
     def __init__(self):
         self.bot = Bot(token=settings.bot_token)
-        self.dp = Dispatcher(storage=MemoryStorage())
-        self.agents = {}  # Кеш AI агентов по user_id
+        self.dp = Dispatcher(storage=ShardedMemoryStorage())
+        # LRU кеш AI агентов по user_id: агенты неактивных пользователей закрываются
+        self.agents: OrderedDict[int, "CloreAIAgent"] = OrderedDict()
+        self._agent_max = 256
+        self._closing_agents: set[asyncio.Task] = set()  # Ссылки на фоновые закрытия агентов
+        # Кеш полей пользователей по telegram_id, ограничен по размеру и времени жизни
+        self.user_cache = TTLCache(maxsize=10_000, ttl=600)
         
         # Регистрируем middleware
-        self.dp.message.middleware(AuthMiddleware())
+        self.dp.message.middleware(create_auth_middleware())
         
         # Регистрируем обработчики
         self._register_handlers()
@@ -60,11 +98,14 @@ class CloreBot:
         self.dp.message.register(self.cmd_servers, Command("servers"))
         self.dp.message.register(self.cmd_menu, Command("menu"))
         
-        # Callback handlers
-        self.dp.callback_query.register(self.callback_main_menu, lambda c: c.data == "main_menu")
-        self.dp.callback_query.register(self.callback_settings, lambda c: c.data.startswith("settings:"))
-        self.dp.callback_query.register(self.callback_server_action, lambda c: c.data.startswith("server:"))
-        self.dp.callback_query.register(self.callback_page_navigation, lambda c: c.data.startswith("page:"))
+        # Callback handlers: один обработчик с таблицей маршрутов по префиксу
+        self._cb_routes = {
+            "main_menu": self.callback_main_menu,
+            "settings": self.callback_settings,
+            "server": self.callback_server_action,
+            "page": self.callback_page_navigation,
+        }
+        self.dp.callback_query.register(self._route_callback)
         
         # Состояния
         self.dp.message.register(self.process_api_key, UserStates.entering_api_key)
@@ -76,7 +117,8 @@ class CloreBot:
     
     async def cmd_start(self, message: Message, state: FSMContext):
         """Обработчик команды /start"""
-        user_id = message.from_user.id
+        u = message.from_user
+        user_id = u.id
         
         async with get_db() as db:
             user = await get_user_by_telegram_id(db, user_id)
@@ -86,57 +128,84 @@ class CloreBot:
                 user = await create_user(
                     db,
                     telegram_id=user_id,
-                    username=message.from_user.username,
-                    first_name=message.from_user.first_name,
-                    last_name=message.from_user.last_name
+                    username=u.username,
+                    first_name=u.first_name,
+                    last_name=u.last_name
                 )
+                auth_cache.invalidate(user_id)
+                self.user_cache[user_id] = self._cache_user(user)
                 
                 await message.answer(
-                    "👋 Добро пожаловать в Clore Bot Pro!\n\n"
-                    "Я помогу вам управлять арендой GPU серверов на платформе Clore.ai\n\n"
-                    "Для начала работы необходимо настроить API ключ.",
+                    WELCOME_NEW,
                     reply_markup=get_settings_keyboard(has_api_key=False)
                 )
             else:
+                self.user_cache[user_id] = self._cache_user(user)
                 await message.answer(
-                    f"👋 С возвращением, {user.first_name}!\n\n"
-                    "Выберите действие:",
+                    WELCOME_BACK_FMT.format(name=user.first_name),
                     reply_markup=get_main_menu_keyboard()
                 )
     
+    @staticmethod
+    def _cache_user(user: User) -> SimpleNamespace:
+        """Снять с пользователя поля, которые нужны обработчикам"""
+        return SimpleNamespace(
+            clore_api_key=user.clore_api_key,
+            default_ssh_password=user.default_ssh_password,
+            default_jupyter_token=user.default_jupyter_token
+        )
+    
+    @staticmethod
+    @asynccontextmanager
+    async def _with_db(db: Optional[AsyncSession] = None):
+        """Использовать переданную сессию или открыть новую"""
+        if db is not None:
+            yield db
+        else:
+            async with get_db() as new_db:
+                yield new_db
+    
+    async def _get_user_cached(
+        self, 
+        user_id: int, 
+        db: Optional[AsyncSession] = None
+    ) -> Optional[SimpleNamespace]:
+        """Получить поля пользователя из кеша, обращаясь к БД только при промахе"""
+        cached = self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        async with self._with_db(db) as db:
+            user = await get_user_by_telegram_id(db, user_id)
+        if not user:
+            return None
+        
+        cached = self.user_cache[user_id] = self._cache_user(user)
+        return cached
+    
+    async def _update_user(
+        self, 
+        user_id: int, 
+        db: Optional[AsyncSession] = None, 
+        **values
+    ) -> bool:
+        """Обновить поля пользователя одним UPDATE и сбросить его кеш"""
+        async with self._with_db(db) as db:
+            updated = await update_user_fields(db, user_id, **values)
+        self.user_cache.pop(user_id, None)
+        auth_cache.invalidate(user_id)
+        return updated
+    
     async def cmd_help(self, message: Message):
         """Обработчик команды /help"""
-        help_text = """
-📚 **Справка по командам:**
-
-/start - Начать работу с ботом
-/menu - Главное меню
-/settings - Настройки (API ключи, пароли)
-/balance - Проверить баланс
-/orders - Мои активные аренды
-/servers - Поиск серверов
-
-**🤖 AI Помощник:**
-Просто напишите, что вам нужно:
-• "Покажи серверы с RTX 4090"
-• "Найди дешевые серверы с 3070"
-• "Сколько я трачу на аренду?"
-• "Арендовать сервер 12345"
-
-**💡 Советы:**
-• Используйте фильтры: цена, GPU, рейтинг
-• AI понимает естественный язык
-• Можно арендовать несколько серверов сразу
-"""
-        await message.answer(help_text)
+        await message.answer(HELP_TEXT)
     
     async def cmd_settings(self, message: Message):
         """Обработчик команды /settings"""
-        async with get_db() as db:
-            user = await get_user_by_telegram_id(db, message.from_user.id)
-            
+        user = await self._get_user_cached(message.from_user.id)
+        
         await message.answer(
-            "⚙️ **Настройки:**",
+            SETTINGS_TITLE,
             reply_markup=get_settings_keyboard(has_api_key=bool(user.clore_api_key))
         )
     
@@ -155,46 +224,45 @@ class CloreBot:
     async def cmd_menu(self, message: Message):
         """Показать главное меню"""
         await message.answer(
-            "📋 Главное меню:",
+            MAIN_MENU,
             reply_markup=get_main_menu_keyboard()
         )
     
-    async def callback_main_menu(self, callback: CallbackQuery):
+    async def _route_callback(self, callback: CallbackQuery, state: FSMContext):
+        """Направить callback обработчику по префиксу данных"""
+        prefix, _, _ = callback.data.partition(":")
+        handler = self._cb_routes.get(prefix)
+        if handler:
+            await handler(callback, state)
+    
+    async def callback_main_menu(self, callback: CallbackQuery, state: FSMContext):
         """Обработчик возврата в главное меню"""
         await callback.message.edit_text(
-            "📋 Главное меню:",
+            MAIN_MENU,
             reply_markup=get_main_menu_keyboard()
         )
         await callback.answer()
     
     async def callback_settings(self, callback: CallbackQuery, state: FSMContext):
         """Обработчик настроек"""
-        action = callback.data.split(":")[1]
+        _, _, rest = callback.data.partition(":")
+        action, _, _ = rest.partition(":")
         
         if action == "api_key":
-            await callback.message.answer(
-                "🔑 Введите ваш Clore API ключ:\n\n"
-                "Получить ключ можно на https://clore.ai/profile/api"
-            )
+            await callback.message.answer(PROMPT_API_KEY)
             await state.set_state(UserStates.entering_api_key)
             
         elif action == "ssh_password":
-            await callback.message.answer(
-                "🔐 Введите пароль SSH по умолчанию:\n"
-                "(макс. 32 символа)"
-            )
+            await callback.message.answer(PROMPT_SSH_PASSWORD)
             await state.set_state(UserStates.entering_ssh_password)
             
         elif action == "jupyter_token":
-            await callback.message.answer(
-                "🎫 Введите токен Jupyter по умолчанию:\n"
-                "(макс. 32 символа)"
-            )
+            await callback.message.answer(PROMPT_JUPYTER_TOKEN)
             await state.set_state(UserStates.entering_jupyter_token)
             
         elif action == "back":
             await callback.message.edit_text(
-                "📋 Главное меню:",
+                MAIN_MENU,
                 reply_markup=get_main_menu_keyboard()
             )
         
@@ -203,27 +271,36 @@ class CloreBot:
     async def process_api_key(self, message: Message, state: FSMContext):
         """Обработка ввода API ключа"""
         api_key = message.text.strip()
+        user_id = message.from_user.id
         
         # Проверяем ключ
         try:
             from clore_api.client import CloreAPIClient
             async with CloreAPIClient(api_key) as client:
-                await client.get_wallets()
+                # Медленный ответ Clore не должен держать диалог настройки
+                await asyncio.wait_for(client.get_wallets(), timeout=5.0)
+            
+            previous = await self._get_user_cached(user_id)
+            
+            # Сохраняем ключ одним UPDATE, сессия открывается только на запись
+            await self._update_user(user_id, clore_api_key=api_key)
             
-            # Сохраняем ключ
-            async with get_db() as db:
-                await update_user_api_key(db, message.from_user.id, api_key)
+            # Клиент мониторинга для старого ключа больше не нужен
+            if previous and previous.clore_api_key and previous.clore_api_key != api_key:
+                await client_pool.evict(previous.clore_api_key)
             
             await message.answer(
-                "✅ API ключ успешно сохранен!",
+                API_KEY_SAVED,
                 reply_markup=get_main_menu_keyboard()
             )
             
+        except asyncio.TimeoutError:
+            await message.answer(ERR_CLORE_TIMEOUT)
+            
         except Exception as e:
-            await message.answer(
-                f"❌ Ошибка проверки ключа: {str(e)}\n"
-                "Проверьте правильность ключа и попробуйте снова."
-            )
+            # Текст ошибки только в лог, пользователю - общий ответ
+            logger.warning(f"API key check failed for user {user_id}: {e}")
+            await message.answer(ERR_API_KEY_CHECK)
         
         await state.clear()
     
@@ -231,13 +308,10 @@ class CloreBot:
         """Обработка ввода SSH пароля"""
         password = message.text.strip()[:32]
         
-        async with get_db() as db:
-            user = await get_user_by_telegram_id(db, message.from_user.id)
-            user.default_ssh_password = password
-            await db.commit()
+        await self._update_user(message.from_user.id, default_ssh_password=password)
         
         await message.answer(
-            "✅ SSH пароль сохранен!",
+            SSH_PASSWORD_SAVED,
             reply_markup=get_main_menu_keyboard()
         )
         await state.clear()
@@ -246,41 +320,30 @@ class CloreBot:
         """Обработка ввода Jupyter токена"""
         token = message.text.strip()[:32]
         
-        async with get_db() as db:
-            user = await get_user_by_telegram_id(db, message.from_user.id)
-            user.default_jupyter_token = token
-            await db.commit()
+        await self._update_user(message.from_user.id, default_jupyter_token=token)
         
         await message.answer(
-            "✅ Jupyter токен сохранен!",
+            JUPYTER_TOKEN_SAVED,
             reply_markup=get_main_menu_keyboard()
         )
         await state.clear()
     
-    async def callback_server_action(self, callback: CallbackQuery):
+    async def callback_server_action(self, callback: CallbackQuery, state: FSMContext):
         """Обработчик действий с серверами"""
-        parts = callback.data.split(":")
-        action = parts[1]
+        _, _, rest = callback.data.partition(":")
+        action, _, _ = rest.partition(":")
         
         if action == "search":
-            await callback.message.answer(
-                "🔍 Введите параметры поиска:\n\n"
-                "Примеры:\n"
-                "• Серверы с RTX 4090\n"
-                "• Дешевле $2 за карту 3080\n"
-                "• 4 карты с рейтингом выше 4"
-            )
+            await callback.message.answer(PROMPT_SEARCH)
         elif action == "hunt":
-            await callback.message.answer(
-                "🎯 Функция 'Охота на серверы' будет доступна в следующей версии!"
-            )
+            await callback.message.answer(HUNT_COMING_SOON)
         
         await callback.answer()
     
-    async def callback_page_navigation(self, callback: CallbackQuery):
+    async def callback_page_navigation(self, callback: CallbackQuery, state: FSMContext):
         """Обработчик навигации по страницам"""
         # TODO: Реализовать навигацию
-        await callback.answer("В разработке")
+        await callback.answer(IN_DEVELOPMENT)
     
     async def process_ai_query(self, message: Message):
         """Обработка запроса через AI агента"""
@@ -288,54 +351,78 @@ class CloreBot:
     
     async def _execute_ai_command(self, message: Message, query: str):
         """Выполнить команду через AI агента"""
-        user_id = message.from_user.id
+        u = message.from_user
+        user_id = u.id
         
-        # Получаем пользователя и проверяем API ключ
-        async with get_db() as db:
-            user = await get_user_by_telegram_id(db, user_id)
-            
-            if not user or not user.clore_api_key:
-                await message.answer(
-                    "❌ Для работы необходимо настроить API ключ Clore.\n"
-                    "Используйте /settings",
-                    reply_markup=get_settings_keyboard(has_api_key=False)
-                )
-                return
+        # Получаем пользователя (из кеша) и проверяем API ключ
+        user = await self._get_user_cached(user_id)
+        
+        if not user or not user.clore_api_key:
+            await message.answer(
+                ERR_NO_API_KEY,
+                reply_markup=get_settings_keyboard(has_api_key=False)
+            )
+            return
         
         # Показываем индикатор загрузки
-        loading_msg = await message.answer("🤖 Обрабатываю запрос...")
+        loading_msg = await message.answer(AI_LOADING)
         
         try:
             # Получаем или создаем агента для пользователя
-            if user_id not in self.agents:
-                self.agents[user_id] = CloreAIAgent(user.clore_api_key)
-            
-            agent = self.agents[user_id]
+            agent = self.agents.get(user_id)
+            if agent is not None:
+                self.agents.move_to_end(user_id)
+            else:
+                if len(self.agents) >= self._agent_max:
+                    # Вытесняем давно не использованного агента
+                    _, victim = self.agents.popitem(last=False)
+                    close_task = asyncio.create_task(victim.close())
+                    self._closing_agents.add(close_task)
+                    close_task.add_done_callback(self._closing_agents.discard)
+                # Тяжелые зависимости агента загружаем только при первом запросе к AI
+                from ai_agent.agent import CloreAIAgent
+                agent = self.agents[user_id] = CloreAIAgent(user.clore_api_key)
             
             # Выполняем запрос с контекстом пользователя
             user_context = {
                 'user_id': user_id,
-                'username': message.from_user.username,
-                'first_name': message.from_user.first_name
+                'username': u.username,
+                'first_name': u.first_name
             }
             response = await agent.process_query(query, user_context)
             
             # Отправляем ответ
             await loading_msg.delete()
             
-            # Разбиваем длинные сообщения
+            # Разбиваем длинные сообщения и отправляем части одновременно.
+            # Порядок доставки не гарантирован, поэтому части нумеруются
             if len(response) > 4000:
                 parts = [response[i:i+4000] for i in range(0, len(response), 4000)]
-                for part in parts:
-                    await message.answer(part, parse_mode="Markdown")
+                total = len(parts)
+                await asyncio.gather(*(
+                    message.answer(f"({n}/{total})\n{part}", parse_mode="Markdown")
+                    for n, part in enumerate(parts, 1)
+                ))
             else:
                 await message.answer(response, parse_mode="Markdown")
                 
-        except Exception as e:
-            logger.error(f"Error processing AI query: {e}")
-            await loading_msg.edit_text(
-                f"❌ Произошла ошибка: {str(e)}"
-            )
+        except asyncio.TimeoutError:
+            logger.warning(f"AI query timed out for user {user_id}")
+            await self._reply_error(message, loading_msg, ERR_TIMEOUT)
+        except TelegramAPIError as e:
+            logger.error(f"Failed to send AI response to user {user_id}: {e}")
+            await self._reply_error(message, loading_msg, ERR_SEND)
+        except Exception:
+            # Подробности только в лог, пользователю - общий текст
+            logger.exception(f"Error processing AI query for user {user_id}")
+            await self._reply_error(message, loading_msg, ERR_INTERNAL)
+    
+    async def _reply_error(self, message: Message, loading_msg: Message, text: str):
+        """Показать ошибку в сообщении загрузки или новым сообщением, если его уже нет"""
+        try:
+            await loading_msg.edit_text(text)
+        except TelegramAPIError:
+            await message.answer(text)
     
     async def start(self):
         """Запуск бота"""
@@ -359,8 +446,12 @@ class CloreBot:
         """Остановка бота"""
         logger.info("Stopping Clore Bot Pro...")
         
-        # Закрываем все AI агенты
-        for agent in self.agents.values():
-            await agent.close()
+        # Закрываем все AI агенты одновременно, дожидаясь и фоновых закрытий
+        await asyncio.gather(
+            *(agent.close() for agent in self.agents.values()),
+            *self._closing_agents,
+            return_exceptions=True
+        )
+        self.agents.clear()
         
         await self.bot.session.close()
@@ -4,9 +4,14 @@ Inline клавиатуры для Telegram бота
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List, Dict, Any, Optional
 
+from config import settings
 
-def get_main_menu_keyboard() -> InlineKeyboardMarkup:
-    """Главное меню"""
+
+_EMPTY: Dict[str, Any] = {}  # Пустой словарь-заглушка для отсутствующих полей
+
+
+def _build_main_menu_keyboard() -> InlineKeyboardMarkup:
+    """Собрать главное меню"""
     keyboard = [
         [
             InlineKeyboardButton(text="💰 Баланс", callback_data="action:balance"),
@@ -27,8 +32,8 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_settings_keyboard(has_api_key: bool = False) -> InlineKeyboardMarkup:
-    """Меню настроек"""
+def _build_settings_keyboard(has_api_key: bool) -> InlineKeyboardMarkup:
+    """Собрать меню настроек"""
     keyboard = []
     
     # API ключ
@@ -54,6 +59,22 @@ def get_settings_keyboard(has_api_key: bool = False) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+# Статичные клавиатуры собираются один раз при импорте и переиспользуются
+_MAIN_MENU_KB = _build_main_menu_keyboard()
+_SETTINGS_KB_WITH_KEY = _build_settings_keyboard(has_api_key=True)
+_SETTINGS_KB_NO_KEY = _build_settings_keyboard(has_api_key=False)
+
+
+def get_main_menu_keyboard() -> InlineKeyboardMarkup:
+    """Главное меню"""
+    return _MAIN_MENU_KB
+
+
+def get_settings_keyboard(has_api_key: bool = False) -> InlineKeyboardMarkup:
+    """Меню настроек"""
+    return _SETTINGS_KB_WITH_KEY if has_api_key else _SETTINGS_KB_NO_KEY
+
+
 def get_server_list_keyboard(
     servers: List[Dict[str, Any]], 
     current_page: int = 0,
@@ -64,23 +85,22 @@ def get_server_list_keyboard(
     if selected_servers is None:
         selected_servers = []
     
-    keyboard = []
+    # Множество для проверки выбора за O(1)
+    selected_set = frozenset(selected_servers)
     
     # Кнопки серверов с чекбоксами
-    for server in servers:
-        server_id = server.get('id')
-        gpu = server.get('specs', {}).get('gpu', 'Unknown')
-        price, _ = extract_server_price(server)
-        
-        # Чекбокс
-        check = "✅" if server_id in selected_servers else "⬜"
-        
-        text = f"{check} #{server_id} | {gpu} | ${price:.2f}/д"
-        callback_data = f"select_server:{server_id}"
-        
-        keyboard.append([
-            InlineKeyboardButton(text=text, callback_data=callback_data)
-        ])
+    server_rows = [
+        [InlineKeyboardButton(
+            text=(
+                f"{'✅' if server.get('id') in selected_set else '⬜'} "
+                f"#{server.get('id')} | "
+                f"{(server.get('specs') or _EMPTY).get('gpu', 'Unknown')} | "
+                f"${extract_server_price(server)[0] or 0:.2f}/д"
+            ),
+            callback_data=f"select_server:{server.get('id')}"
+        )]
+        for server in servers
+    ]
     
     # Навигация по страницам
     nav_buttons = []
@@ -101,9 +121,6 @@ def get_server_list_keyboard(
             InlineKeyboardButton(text="Вперед ▶️", callback_data=f"page:{current_page+1}")
         )
     
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
     # Действия
     action_buttons = []
     if selected_servers:
@@ -121,7 +138,9 @@ def get_server_list_keyboard(
         InlineKeyboardButton(text="◀️ Меню", callback_data="main_menu")
     )
     
-    keyboard.append(action_buttons)
+    # Итоговый список собирается один раз нужного размера: серверы, навигация, действия.
+    # Навигация никогда не пуста - в ней всегда есть номер страницы
+    keyboard = [*server_rows, nav_buttons, action_buttons]
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -190,6 +209,15 @@ def get_confirm_keyboard(action: str, data: Any = None) -> InlineKeyboardMarkup:
 
 def get_hunt_settings_keyboard(hunt_task_id: Optional[int] = None) -> InlineKeyboardMarkup:
     """Клавиатура настроек охоты"""
+    # Без задачи клавиатура всегда одинаковая
+    if not hunt_task_id:
+        return _HUNT_EMPTY_KB
+    
+    return _build_hunt_settings_keyboard(hunt_task_id)
+
+
+def _build_hunt_settings_keyboard(hunt_task_id: Optional[int]) -> InlineKeyboardMarkup:
+    """Собрать клавиатуру настроек охоты"""
     keyboard = []
     
     if hunt_task_id:
@@ -215,6 +243,9 @@ def get_hunt_settings_keyboard(hunt_task_id: Optional[int] = None) -> InlineKeyb
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+_HUNT_EMPTY_KB = _build_hunt_settings_keyboard(None)
+
+
 def get_notification_settings_keyboard(user_settings: Dict[str, Any]) -> InlineKeyboardMarkup:
     """Клавиатура настроек уведомлений"""
     sound_enabled = user_settings.get('alert_sound_enabled', True)
@@ -250,19 +281,20 @@ def get_notification_settings_keyboard(user_settings: Dict[str, Any]) -> InlineK
 # Вспомогательная функция из клиента (чтобы не импортировать)
 def extract_server_price(server_data: Dict[str, Any]) -> tuple[Optional[float], Optional[str]]:
     """Извлечь цену сервера"""
-    from config import settings
-    
-    price_data = server_data.get('price', {})
+    price_data = server_data.get('price') or _EMPTY
     
     # Приоритет 1: Цена в USD
-    usd_price = price_data.get('usd', {}).get('on_demand_clore')
-    if usd_price is not None:
-        return usd_price, 'USD'
+    usd = price_data.get('usd')
+    if usd:
+        usd_price = usd.get('on_demand_clore')
+        if usd_price is not None:
+            return usd_price, 'USD'
     
     # Приоритет 2: Фиксированная цена в CLORE
-    clore_price = price_data.get('on_demand', {}).get('CLORE-Blockchain')
-    if clore_price is not None:
-        usd_equivalent = clore_price * settings.clore_to_usd
-        return usd_equivalent, 'CLORE_FIXED'
+    on_demand = price_data.get('on_demand')
+    if on_demand:
+        clore_price = on_demand.get('CLORE-Blockchain')
+        if clore_price is not None:
+            return clore_price * settings.clore_to_usd, 'CLORE_FIXED'
     
-    return None, None
\ No newline at end of file
+    return None, None
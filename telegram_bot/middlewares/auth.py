@@ -1,14 +1,65 @@
 """
 Middleware для аутентификации и авторизации
 """
-from typing import Callable, Dict, Any, Awaitable
+import asyncio
+from typing import Callable, Dict, Any, Awaitable, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from loguru import logger
 
 from config import settings
 from database.session import get_db
-from database.crud import get_user_by_telegram_id
+from database.crud import get_user_by_telegram_id, get_users_by_telegram_ids
+from database.models import User
+from telegram_bot.middlewares import auth_cache
+from telegram_bot.middlewares.auth_cache import CachedUser
+
+
+class _UserBatchLoader:
+    """
+    Объединяет промахи кеша, пришедшие в одном коротком окне,
+    в один запрос WHERE telegram_id IN (...)
+    """
+    
+    def __init__(self, window: float = 0.005):
+        self.window = window
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def load(self, telegram_id: int) -> Optional[User]:
+        future = self._pending.get(telegram_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[telegram_id] = future
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        # shield: отмена одного обработчика не должна отменять результат для остальных
+        return await asyncio.shield(future)
+    
+    async def _flush(self):
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        
+        try:
+            async with get_db() as db:
+                if len(pending) == 1:
+                    (telegram_id,) = pending
+                    users = {telegram_id: await get_user_by_telegram_id(db, telegram_id)}
+                else:
+                    users = await get_users_by_telegram_ids(db, pending.keys())
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for telegram_id, future in pending.items():
+            if not future.done():
+                future.set_result(users.get(telegram_id))
+
+
+_user_batcher = _UserBatchLoader()
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -22,40 +73,74 @@ class AuthMiddleware(BaseMiddleware):
     ) -> Any:
         
         user_id = event.from_user.id
+        text = getattr(event, 'text', None)
         
         # Пропускаем команду /start
-        if hasattr(event, 'text') and event.text and event.text.startswith('/start'):
+        if text is not None and text.startswith('/start'):
             return await handler(event, data)
         
-        # Проверяем, есть ли пользователь в БД
-        async with get_db() as db:
-            user = await get_user_by_telegram_id(db, user_id)
+        user = await self._authorize(event, user_id)
+        if user is None:
+            return
+        
+        # Добавляем в контекст снимок CachedUser (не ORM объект), он может отставать от БД до 60 секунд
+        data['cached_user'] = user
+        
+        return await handler(event, data)
+    
+    async def _authorize(self, event: Message, user_id: int) -> Optional[CachedUser]:
+        """Проверить регистрацию и активность; None - доступ запрещен, ответ уже отправлен"""
+        # Сначала проверяем кеш, к БД обращаемся только при промахе
+        user = auth_cache.get(user_id)
+        if user is None:
+            db_user = await _user_batcher.load(user_id)
             
-            if not user:
+            if not db_user:
+                logger.debug("Auth rejected {}: not registered", user_id)
                 await event.answer(
                     "❌ Вы не зарегистрированы в системе.\n"
                     "Используйте /start для регистрации."
                 )
-                return
+                return None
             
-            # Проверяем активность
-            if not user.is_active:
-                await event.answer(
-                    "❌ Ваш аккаунт деактивирован.\n"
-                    "Обратитесь к администратору."
-                )
-                return
-            
-            # Проверяем подписку для коммерческой версии
-            if settings.enable_premium_check:
-                if not user.is_premium:
-                    await event.answer(
-                        "❌ Требуется активная подписка.\n"
-                        "Обратитесь к администратору для активации."
-                    )
-                    return
-            
-            # Добавляем пользователя в контекст
-            data['user'] = user
+            user = auth_cache.put(user_id, db_user)
+        
+        # Проверяем активность
+        if not user.is_active:
+            logger.debug("Auth rejected {}: inactive", user_id)
+            await event.answer(
+                "❌ Ваш аккаунт деактивирован.\n"
+                "Обратитесь к администратору."
+            )
+            return None
+        
+        return user
+
+
+class PremiumAuthMiddleware(AuthMiddleware):
+    """Авторизация с проверкой подписки для коммерческой версии"""
+    
+    async def _authorize(self, event: Message, user_id: int) -> Optional[CachedUser]:
+        user = await super()._authorize(event, user_id)
+        if user is None:
+            return None
         
-        return await handler(event, data)
\ No newline at end of file
+        if not user.is_premium:
+            logger.debug("Auth rejected {}: no premium", user_id)
+            await event.answer(
+                "❌ Требуется активная подписка.\n"
+                "Обратитесь к администратору для активации."
+            )
+            return None
+        
+        return user
+
+
+def create_auth_middleware() -> AuthMiddleware:
+    """
+    Выбрать реализацию по настройкам один раз при старте,
+    чтобы не проверять enable_premium_check на каждом обновлении
+    """
+    if settings.enable_premium_check:
+        return PremiumAuthMiddleware()
+    return AuthMiddleware()
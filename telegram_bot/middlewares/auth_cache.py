@@ -0,0 +1,40 @@
+"""
+Кеш результатов аутентификации пользователей
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Снимок полей пользователя, нужных для проверки доступа"""
+    id: int
+    is_active: bool
+    is_premium: bool
+
+
+# telegram_id -> CachedUser; ORM объекты не храним, чтобы не держать отсоединенные сессии
+_cache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def get(telegram_id: int) -> Optional[CachedUser]:
+    """Получить пользователя из кеша"""
+    return _cache.get(telegram_id)
+
+
+def put(telegram_id: int, user) -> CachedUser:
+    """Сохранить снимок пользователя в кеш"""
+    cached = CachedUser(
+        id=user.id,
+        is_active=bool(user.is_active),
+        is_premium=bool(user.is_premium)
+    )
+    _cache[telegram_id] = cached
+    return cached
+
+
+def invalidate(telegram_id: int):
+    """Сбросить запись после регистрации или изменения статуса пользователя"""
+    _cache.pop(telegram_id, None)
@@ -0,0 +1,69 @@
+"""
+Шардированное in-memory хранилище FSM для Telegram бота
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorageRecord
+
+
+class ShardedMemoryStorage(BaseStorage):
+    """
+    Хранилище состояний FSM, разбитое на шарды по user_id.
+    У каждого шарда свой словарь и своя блокировка, поэтому изменения
+    данных разных пользователей не упираются в одну блокировку.
+    """
+
+    def __init__(self, n_shards: int = 16):
+        self.n_shards = n_shards
+        self._shards: List[Tuple[Dict[StorageKey, MemoryStorageRecord], asyncio.Lock]] = [
+            ({}, asyncio.Lock()) for _ in range(n_shards)
+        ]
+
+    def _shard(self, key: StorageKey) -> Tuple[Dict[StorageKey, MemoryStorageRecord], asyncio.Lock]:
+        return self._shards[key.user_id % self.n_shards]
+
+    @staticmethod
+    def _prune(records: Dict[StorageKey, MemoryStorageRecord], key: StorageKey):
+        """Удалить пустую запись, чтобы хранилище не росло на каждого пользователя"""
+        record = records.get(key)
+        if record is not None and record.state is None and not record.data:
+            del records[key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        records, lock = self._shard(key)
+        async with lock:
+            record = records.setdefault(key, MemoryStorageRecord())
+            record.state = state.state if isinstance(state, State) else state
+            self._prune(records, key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._shard(key)[0].get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        records, lock = self._shard(key)
+        async with lock:
+            record = records.setdefault(key, MemoryStorageRecord())
+            record.data = data.copy()
+            self._prune(records, key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._shard(key)[0].get(key)
+        return record.data.copy() if record else {}
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Чтение и запись под блокировкой шарда, чтобы обновление было атомарным
+        records, lock = self._shard(key)
+        async with lock:
+            record = records.setdefault(key, MemoryStorageRecord())
+            record.data = {**record.data, **data}
+            result = record.data.copy()
+            self._prune(records, key)
+        return result
+
+    async def close(self) -> None:
+        for records, _ in self._shards:
+            records.clear()
@@ -0,0 +1,87 @@
+"""
+Статические тексты сообщений Telegram бота
+"""
+
+HELP_TEXT = """
+📚 **Справка по командам:**
+
+/start - Начать работу с ботом
+/menu - Главное меню
+/settings - Настройки (API ключи, пароли)
+/balance - Проверить баланс
+/orders - Мои активные аренды
+/servers - Поиск серверов
+
+**🤖 AI Помощник:**
+Просто напишите, что вам нужно:
+• "Покажи серверы с RTX 4090"
+• "Найди дешевые серверы с 3070"
+• "Сколько я трачу на аренду?"
+• "Арендовать сервер 12345"
+
+**💡 Советы:**
+• Используйте фильтры: цена, GPU, рейтинг
+• AI понимает естественный язык
+• Можно арендовать несколько серверов сразу
+"""
+
+WELCOME_NEW = (
+    "👋 Добро пожаловать в Clore Bot Pro!\n\n"
+    "Я помогу вам управлять арендой GPU серверов на платформе Clore.ai\n\n"
+    "Для начала работы необходимо настроить API ключ."
+)
+
+# Подставляется через .format(name=...)
+WELCOME_BACK_FMT = (
+    "👋 С возвращением, {name}!\n\n"
+    "Выберите действие:"
+)
+
+MAIN_MENU = "📋 Главное меню:"
+SETTINGS_TITLE = "⚙️ **Настройки:**"
+AI_LOADING = "🤖 Обрабатываю запрос..."
+
+# Настройки
+PROMPT_API_KEY = (
+    "🔑 Введите ваш Clore API ключ:\n\n"
+    "Получить ключ можно на https://clore.ai/profile/api"
+)
+PROMPT_SSH_PASSWORD = (
+    "🔐 Введите пароль SSH по умолчанию:\n"
+    "(макс. 32 символа)"
+)
+PROMPT_JUPYTER_TOKEN = (
+    "🎫 Введите токен Jupyter по умолчанию:\n"
+    "(макс. 32 символа)"
+)
+API_KEY_SAVED = "✅ API ключ успешно сохранен!"
+SSH_PASSWORD_SAVED = "✅ SSH пароль сохранен!"
+JUPYTER_TOKEN_SAVED = "✅ Jupyter токен сохранен!"
+
+# Серверы
+PROMPT_SEARCH = (
+    "🔍 Введите параметры поиска:\n\n"
+    "Примеры:\n"
+    "• Серверы с RTX 4090\n"
+    "• Дешевле $2 за карту 3080\n"
+    "• 4 карты с рейтингом выше 4"
+)
+HUNT_COMING_SOON = "🎯 Функция 'Охота на серверы' будет доступна в следующей версии!"
+IN_DEVELOPMENT = "В разработке"
+
+ERR_NO_API_KEY = (
+    "❌ Для работы необходимо настроить API ключ Clore.\n"
+    "Используйте /settings"
+)
+
+# Ошибки проверки API ключа
+ERR_CLORE_TIMEOUT = "⏱ Clore API не отвечает, попробуйте позже"
+ERR_API_KEY_CHECK = (
+    "❌ Не удалось проверить ключ.\n"
+    "Проверьте правильность ключа и попробуйте снова."
+)
+
+# Тексты ошибок AI запросов
+ERR_TIMEOUT = "⏱ Превышено время ожидания ответа, попробуйте позже"
+ERR_SEND = "❌ Не удалось отправить ответ, попробуйте переформулировать запрос"
+ERR_INTERNAL = "❌ Внутренняя ошибка, попробуйте позже"
@@ -3,6 +3,7 @@
 Тестирование улучшенного AI агента
 """
 import asyncio
+import re
 import sys
 from loguru import logger
 from rich.console import Console
@@ -14,9 +15,25 @@ sys.path.append('.')
 
 from ai_agent.agent import CloreAIAgent
 from config import settings
+from utils.openai_client import close as close_openai_client
 
 console = Console()
 
+# Признаки Markdown в ответе: заголовок в начале строки, жирный текст или блок кода
+_MD_DETECT = re.compile(r'^#|\*\*|```', re.M)
+
+# Команды завершения интерактивного режима
+_EXIT_WORDS = frozenset({'exit', 'quit', 'выход'})
+
+
+async def ainput(prompt: str = "") -> str:
+    """
+    input() в потоке, чтобы не блокировать цикл событий.
+    После Ctrl+C во время ввода поток дочитывает строку, поэтому выход
+    завершается после Enter
+    """
+    return await asyncio.to_thread(input, prompt)
+
 
 async def test_agent():
     """Интерактивное тестирование агента"""
@@ -36,7 +53,10 @@ async def test_agent():
     
     # Запрашиваем Clore API ключ
     console.print("\n[yellow]Введите ваш Clore API ключ:[/yellow]")
-    api_key = input("> ").strip()
+    try:
+        api_key = (await ainput("> ")).strip()
+    except EOFError:
+        api_key = ""
     
     if not api_key:
         console.print("[red]❌ API ключ не введен![/red]")
@@ -46,6 +66,9 @@ async def test_agent():
     console.print("\n[green]Инициализация агента...[/green]")
     agent = CloreAIAgent(api_key)
     
+    # Соединения прогреваются, пока пользователь читает примеры и набирает запрос
+    warmup_task = asyncio.create_task(agent.warmup())
+    
     console.print("[green]✅ Агент готов к работе![/green]\n")
     
     # Примеры запросов
@@ -69,9 +92,12 @@ async def test_agent():
         while True:
             # Запрос пользователя
             console.print("[bold cyan]Вы:[/bold cyan]", end=" ")
-            query = input().strip()
+            try:
+                query = (await ainput()).strip()
+            except EOFError:
+                break
             
-            if query.lower() in ['exit', 'quit', 'выход']:
+            if query.lower() in _EXIT_WORDS:
                 break
             
             if not query:
@@ -87,7 +113,7 @@ async def test_agent():
                 console.print("\n[bold green]AI Agent:[/bold green]")
                 
                 # Форматируем markdown
-                if response.startswith("#") or "**" in response or "```" in response:
+                if _MD_DETECT.search(response):
                     md = Markdown(response)
                     console.print(md)
                 else:
@@ -95,12 +121,13 @@ async def test_agent():
                 
             except Exception as e:
                 console.print(f"\n[red]❌ Ошибка: {str(e)}[/red]")
-                logger.error(f"Error processing query: {e}", exc_info=True)
+                logger.opt(exception=True).error("Error processing query: {}", e)
             
             console.print("\n" + "="*50 + "\n")
     
     finally:
         # Закрываем агента
+        warmup_task.cancel()
         await agent.close()
         console.print("\n[yellow]Сеанс завершен. До свидания![/yellow]")
 
@@ -168,7 +195,9 @@ async def main():
         console.print("\n[yellow]Прервано пользователем[/yellow]")
     except Exception as e:
         console.print(f"\n[red]Критическая ошибка: {str(e)}[/red]")
-        logger.error("Critical error", exc_info=True)
+        logger.opt(exception=True).error("Critical error: {}", e)
+    finally:
+        await close_openai_client()
 
 
 if __name__ == "__main__":
@@ -179,4 +208,15 @@ if __name__ == "__main__":
         print("Установите rich для красивого вывода: pip install rich")
         sys.exit(1)
     
-    asyncio.run(main())
+    # uvloop ускоряет цикл событий, если установлен (нет под Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Прервано пользователем[/yellow]")
+        sys.exit(130)
@@ -3,8 +3,8 @@
 Проверка работы OpenAI API
 """
 import asyncio
-from openai import AsyncOpenAI
 from config import settings
+from utils.openai_client import get_client, close as close_client
 
 async def test_openai():
     """Тест подключения к OpenAI"""
@@ -15,21 +15,30 @@ async def test_openai():
         return
     
     try:
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
+        client = get_client()
         
         # Простой тест
         print("📝 Отправка тестового запроса...")
-        response = await client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": "Say hello in Russian"}
             ],
-            max_tokens=50
+            max_tokens=50,
+            stream=True
         )
         
-        print(f"✅ Ответ получен: {response.choices[0].message.content}")
-        print(f"✅ Модель: {response.model}")
+        # Печатаем ответ по мере поступления фрагментов
+        print("✅ Ответ получен: ", end="", flush=True)
+        model = None
+        async for chunk in stream:
+            model = model or chunk.model
+            if chunk.choices:
+                print(chunk.choices[0].delta.content or "", end="", flush=True)
+        print()
+        
+        print(f"✅ Модель: {model}")
         print(f"✅ OpenAI API работает корректно!")
         
     except Exception as e:
@@ -38,6 +47,16 @@ async def test_openai():
         print("1. Неверный API ключ")
         print("2. Закончились кредиты")
         print("3. Проблемы с сетью")
+    
+    finally:
+        await close_client()
 
 if __name__ == "__main__":
+    # uvloop ускоряет цикл событий, если установлен (нет под Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     asyncio.run(test_openai())
@@ -0,0 +1,118 @@
+"""
+Тесты для объединения запросов пользователей в AuthMiddleware
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database.crud import create_user, get_users_by_telegram_ids
+from database.models import Base
+from telegram_bot.middlewares import auth
+from telegram_bot.middlewares.auth import _UserBatchLoader
+
+# Telegram ID давно вышли за пределы int32
+BIG_ID = 2 ** 40 + 7
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Подменить БД в middleware и записывать выполненные запросы"""
+    users = {
+        5: SimpleNamespace(id=1, telegram_id=5),
+        BIG_ID: SimpleNamespace(id=2, telegram_id=BIG_ID),
+    }
+    calls = []
+    
+    @asynccontextmanager
+    async def get_db():
+        yield None
+    
+    async def get_user_by_telegram_id(db, telegram_id):
+        calls.append(("one", telegram_id))
+        return users.get(telegram_id)
+    
+    async def get_users_by_telegram_ids(db, telegram_ids):
+        ids = list(telegram_ids)
+        calls.append(("many", sorted(ids)))
+        return {i: users[i] for i in ids if i in users}
+    
+    monkeypatch.setattr(auth, "get_db", get_db)
+    monkeypatch.setattr(auth, "get_user_by_telegram_id", get_user_by_telegram_id)
+    monkeypatch.setattr(auth, "get_users_by_telegram_ids", get_users_by_telegram_ids)
+    return users, calls
+
+
+class TestUserBatchLoader:
+    """Тесты для _UserBatchLoader"""
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_ids_coalesced_into_one_query(self, fake_db):
+        """Одновременные промахи, включая дубликаты, дают один IN запрос"""
+        users, calls = fake_db
+        loader = _UserBatchLoader(window=0.001)
+        
+        results = await asyncio.gather(
+            loader.load(5), loader.load(BIG_ID), loader.load(5), loader.load(99)
+        )
+        
+        assert results == [users[5], users[BIG_ID], users[5], None]
+        assert calls == [("many", [5, 99, BIG_ID])]
+    
+    @pytest.mark.asyncio
+    async def test_single_miss_uses_direct_lookup(self, fake_db):
+        """Одиночный промах идет обычным запросом по одному ID"""
+        users, calls = fake_db
+        loader = _UserBatchLoader(window=0.001)
+        
+        assert await loader.load(BIG_ID) is users[BIG_ID]
+        assert calls == [("one", BIG_ID)]
+    
+    @pytest.mark.asyncio
+    async def test_next_window_starts_new_batch(self, fake_db):
+        """После сброса окна следующий промах собирает новую пачку"""
+        users, calls = fake_db
+        loader = _UserBatchLoader(window=0.001)
+        
+        await loader.load(5)
+        await loader.load(5)
+        
+        assert calls == [("one", 5), ("one", 5)]
+    
+    @pytest.mark.asyncio
+    async def test_query_error_propagates_to_all_waiters(self, monkeypatch, fake_db):
+        """Ошибку БД получают все ожидающие, а не только первый"""
+        async def broken(db, telegram_ids):
+            raise RuntimeError("db down")
+        
+        monkeypatch.setattr(auth, "get_users_by_telegram_ids", broken)
+        loader = _UserBatchLoader(window=0.001)
+        
+        results = await asyncio.gather(
+            loader.load(1), loader.load(2), return_exceptions=True
+        )
+        
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_get_users_by_telegram_ids_handles_big_ids():
+    """IN запрос находит пользователей с Telegram ID больше 2^31"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await create_user(db, telegram_id=BIG_ID, first_name="big")
+            await create_user(db, telegram_id=5, first_name="small")
+            
+            users = await get_users_by_telegram_ids(db, [BIG_ID, 5, 2 ** 31])
+            
+            assert set(users) == {BIG_ID, 5}
+            assert users[BIG_ID].first_name == "big"
+            assert await get_users_by_telegram_ids(db, []) == {}
+    finally:
+        await engine.dispose()
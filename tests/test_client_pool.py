@@ -0,0 +1,74 @@
+"""
+Тесты для пула клиентов Clore API
+"""
+import pytest
+
+from services.monitoring import client_pool
+
+
+class FakeClient:
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.closed = False
+    
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_pool(monkeypatch):
+    """Пустой пул с клиентами-заглушками"""
+    monkeypatch.setattr(client_pool, "CloreAPIClient", FakeClient)
+    monkeypatch.setattr(client_pool, "_clients", type(client_pool._clients)())
+    monkeypatch.setattr(client_pool, "_in_use", {})
+    monkeypatch.setattr(client_pool, "_retired", set())
+
+
+class TestClientPool:
+    """Тесты для lease/evict"""
+    
+    @pytest.mark.asyncio
+    async def test_same_key_shares_client(self):
+        """Один ключ - один клиент"""
+        async with client_pool.lease("a") as first:
+            async with client_pool.lease("a") as second:
+                assert first is second
+    
+    @pytest.mark.asyncio
+    async def test_evict_waits_for_lease(self):
+        """Вытесненный клиент закрывается только после последнего использования"""
+        async with client_pool.lease("a") as client:
+            async with client_pool.lease("a"):
+                await client_pool.evict("a")
+                assert not client.closed
+            assert not client.closed
+        
+        assert client.closed
+        
+        async with client_pool.lease("a") as fresh:
+            assert fresh is not client
+    
+    @pytest.mark.asyncio
+    async def test_lru_limit(self, monkeypatch):
+        """Сверх лимита закрывается давно не использованный клиент"""
+        monkeypatch.setattr(client_pool, "_MAX_CLIENTS", 2)
+        
+        async with client_pool.lease("a") as a:
+            pass
+        async with client_pool.lease("b"):
+            pass
+        async with client_pool.lease("a"):
+            pass
+        async with client_pool.lease("c"):
+            pass
+        
+        assert list(client_pool._clients) == ["a", "c"]
+        assert not a.closed
+    
+    @pytest.mark.asyncio
+    async def test_close_all_closes_retired(self):
+        """close_all закрывает и отложенные к закрытию клиенты"""
+        async with client_pool.lease("a") as client:
+            await client_pool.evict("a")
+            await client_pool.close_all()
+            assert client.closed
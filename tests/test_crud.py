@@ -0,0 +1,174 @@
+"""
+Тесты для пакетных запросов CRUD на in-memory SQLite
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database.crud import (
+    create_alerts_bulk,
+    create_docker_template,
+    create_user,
+    expire_missing_orders,
+    get_docker_templates,
+    mark_alerts_sent_bulk,
+    save_orders_bulk,
+    update_orders_spent_bulk,
+)
+from database.models import Alert, Base, Order
+
+
+@pytest_asyncio.fixture
+async def db():
+    """Сессия на чистой in-memory базе"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+    finally:
+        await engine.dispose()
+
+
+async def _template(db, name, user_id=None, usage_count=0):
+    template = await create_docker_template(db, name=name, image="image", user_id=user_id)
+    template.usage_count = usage_count
+    await db.commit()
+    return template
+
+
+def _api_order(order_id: int, spend: float = 0.0) -> dict:
+    return {'id': order_id, 'si': 100 + order_id, 'ct': 1_700_000_000, 'mrl': 3600, 'spend': spend}
+
+
+async def _orders(db) -> dict:
+    result = await db.execute(select(Order).execution_options(populate_existing=True))
+    return {o.clore_order_id: o for o in result.scalars()}
+
+
+class TestGetDockerTemplates:
+    """Тесты для get_docker_templates"""
+    
+    @pytest.mark.asyncio
+    async def test_union_of_user_and_global(self, db):
+        """UNION ALL возвращает свои и глобальные шаблоны по убыванию использования"""
+        owner = await create_user(db, telegram_id=1)
+        other = await create_user(db, telegram_id=2)
+        
+        await _template(db, "own", owner.id, usage_count=5)
+        await _template(db, "global", usage_count=10)
+        await _template(db, "foreign", other.id, usage_count=50)
+        
+        templates = await get_docker_templates(db, user_id=owner.id)
+        
+        assert [t.name for t in templates] == ["global", "own"]
+    
+    @pytest.mark.asyncio
+    async def test_single_branch(self, db):
+        """Без глобальных шаблонов и без пользователя работает одна выборка"""
+        owner = await create_user(db, telegram_id=1)
+        await _template(db, "own", owner.id)
+        await _template(db, "global")
+        
+        own = await get_docker_templates(db, user_id=owner.id, include_global=False)
+        global_only = await get_docker_templates(db)
+        
+        assert [t.name for t in own] == ["own"]
+        assert [t.name for t in global_only] == ["global"]
+
+
+
+class TestMarkAlertsSentBulk:
+    """Тесты для mark_alerts_sent_bulk"""
+    
+    @pytest.mark.asyncio
+    async def test_marks_sent_and_failed(self, db):
+        """Успешные и неудачные отправки отмечаются, ошибки пишутся по id"""
+        user = await create_user(db, telegram_id=1)
+        await create_alerts_bulk(db, [
+            dict(user_id=user.id, alert_type="test", title=str(i), message="m")
+            for i in range(4)
+        ])
+        ids = list((await db.execute(select(Alert.id).order_by(Alert.id))).scalars())
+        
+        updated = await mark_alerts_sent_bulk(
+            db, ids[:2], failed=[(ids[2], "blocked"), (ids[3], "timeout")]
+        )
+        
+        assert updated == 4
+        alerts = {a.id: a for a in (await db.execute(select(Alert))).scalars()}
+        assert all(a.is_sent and a.sent_at for a in alerts.values())
+        assert [alerts[i].error for i in ids] == [None, None, "blocked", "timeout"]
+    
+    @pytest.mark.asyncio
+    async def test_empty(self, db):
+        """Пустой вызов не выполняет запросов"""
+        assert await mark_alerts_sent_bulk(db, []) == 0
+
+
+
+class TestOrdersBulk:
+    """Тесты для пакетной записи заказов"""
+    
+    @pytest.mark.asyncio
+    async def test_save_orders_bulk(self, db):
+        """Заказы сохраняются одним INSERT с полями из API"""
+        user = await create_user(db, telegram_id=1)
+        
+        saved = await save_orders_bulk(db, user.id, [_api_order(1), _api_order(2, spend=3.5)])
+        
+        orders = await _orders(db)
+        assert saved == 2
+        assert set(orders) == {1, 2}
+        assert orders[2].total_spent == 3.5
+        assert orders[2].server_id == 102
+        assert (orders[1].expires_at - orders[1].created_at).total_seconds() == 3600
+        assert await save_orders_bulk(db, user.id, []) == 0
+    
+    @pytest.mark.asyncio
+    async def test_update_orders_spent_bulk(self, db):
+        """CASE по id обновляет только переданные заказы"""
+        user = await create_user(db, telegram_id=1)
+        await save_orders_bulk(db, user.id, [_api_order(i, spend=1.0) for i in (1, 2, 3)])
+        await db.execute(Order.__table__.update().values(status='expired'))
+        await db.commit()
+        
+        updated = await update_orders_spent_bulk(db, {1: 10.0, 2: 20.0})
+        
+        orders = await _orders(db)
+        assert updated == 2
+        assert [orders[i].total_spent for i in (1, 2, 3)] == [10.0, 20.0, 1.0]
+        assert [orders[i].status for i in (1, 2, 3)] == ['active', 'active', 'expired']
+    
+    @pytest.mark.asyncio
+    async def test_update_orders_spent_bulk_keeps_unknown_spend(self, db):
+        """Заказ без суммы в API сохраняет прежнее total_spent"""
+        user = await create_user(db, telegram_id=1)
+        await save_orders_bulk(db, user.id, [_api_order(i, spend=1.0) for i in (1, 2)])
+        
+        updated = await update_orders_spent_bulk(db, {1: None, 2: 5.0})
+        assert await update_orders_spent_bulk(db, {2: None}) == 1
+        
+        orders = await _orders(db)
+        assert updated == 2
+        assert [orders[i].total_spent for i in (1, 2)] == [1.0, 5.0]
+    
+    @pytest.mark.asyncio
+    async def test_expire_missing_orders(self, db):
+        """Один UPDATE ... RETURNING завершает только пропавшие активные заказы пользователя"""
+        user = await create_user(db, telegram_id=1)
+        other = await create_user(db, telegram_id=2)
+        await save_orders_bulk(db, user.id, [_api_order(i) for i in (1, 2, 3)])
+        await save_orders_bulk(db, other.id, [_api_order(4)])
+        
+        expired = await expire_missing_orders(db, user.id, {2})
+        
+        orders = await _orders(db)
+        assert sorted(expired) == [1, 3]
+        assert {i: o.status for i, o in orders.items()} == {
+            1: 'expired', 2: 'active', 3: 'expired', 4: 'active'
+        }
+        assert await expire_missing_orders(db, user.id, {2}) == []
@@ -0,0 +1,63 @@
+"""
+Тесты для планировщика проверок пользователей
+"""
+from services.monitoring.scheduler import UserScheduler
+
+
+class TestUserScheduler:
+    """Тесты для UserScheduler"""
+    
+    @staticmethod
+    def _scheduler(**kwargs) -> UserScheduler:
+        # Без случайного сдвига, чтобы дедлайны были детерминированными
+        return UserScheduler(base_interval=10, jitter=0, **kwargs)
+    
+    def test_new_users_due_within_base_interval(self):
+        """Первая проверка новых пользователей попадает в базовый интервал"""
+        scheduler = self._scheduler()
+        scheduler.sync([1, 2, 3], now=0.0)
+        
+        assert sorted(scheduler.pop_due(now=10.0)) == [1, 2, 3]
+        assert scheduler.pop_due(now=10.0) == []
+        assert scheduler.next_due() is None
+    
+    def test_backoff_capped_at_four_times_base(self):
+        """Без изменений интервал растет и упирается в 4x базового"""
+        scheduler = self._scheduler(backoff=2)
+        scheduler.sync([1], now=0.0)
+        scheduler.pop_due(now=10.0)
+        
+        now = 10.0
+        intervals = []
+        for _ in range(4):
+            scheduler.reschedule(1, changed=False, now=now)
+            due_at = scheduler.next_due()
+            intervals.append(due_at - now)
+            assert scheduler.pop_due(now=due_at) == [1]
+            now = due_at
+        
+        assert intervals == [20, 40, 40, 40]
+    
+    def test_change_resets_interval(self):
+        """Изменение данных возвращает базовый интервал"""
+        scheduler = self._scheduler(backoff=2)
+        scheduler.sync([1], now=0.0)
+        scheduler.pop_due(now=10.0)
+        
+        scheduler.reschedule(1, changed=False, now=10.0)
+        scheduler.pop_due(now=30.0)
+        scheduler.reschedule(1, changed=True, now=30.0)
+        
+        assert scheduler.next_due() == 40.0
+    
+    def test_sync_drops_removed_users(self):
+        """Пользователи, исчезнувшие из выборки, больше не планируются"""
+        scheduler = self._scheduler()
+        scheduler.sync([1, 2], now=0.0)
+        scheduler.sync([1], now=0.0)
+        
+        assert scheduler.pop_due(now=100.0) == [1]
+        
+        # Перепланирование удаленного пользователя игнорируется
+        scheduler.reschedule(2, changed=True, now=100.0)
+        assert scheduler.pop_due(now=1000.0) == []
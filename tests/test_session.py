@@ -0,0 +1,41 @@
+"""
+Тесты для инициализации базы данных
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import session
+from database.models import Base, ExchangeRate
+
+
+@pytest.mark.asyncio
+async def test_init_exchange_rates_is_idempotent(monkeypatch):
+    """Повторный запуск не дублирует и не перезаписывает курс CLORE/USD"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    monkeypatch.setattr(session, "engine", engine)
+    monkeypatch.setattr(
+        session, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False)
+    )
+    
+    try:
+        await session.init_exchange_rates()
+        
+        async with session.get_db() as db:
+            rate = (await db.execute(select(ExchangeRate))).scalar_one()
+            rate.rate = 0.5
+        
+        # ON CONFLICT DO NOTHING: вторая вставка молча пропускается
+        await session.init_exchange_rates()
+        
+        async with session.get_db() as db:
+            rates = (await db.execute(select(ExchangeRate))).scalars().all()
+        
+        assert len(rates) == 1
+        assert (rates[0].currency_from, rates[0].currency_to) == ("CLORE", "USD")
+        assert rates[0].rate == 0.5
+    finally:
+        await engine.dispose()
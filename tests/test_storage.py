@@ -0,0 +1,71 @@
+"""
+Тесты для шардированного хранилища FSM
+"""
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from telegram_bot.storage import ShardedMemoryStorage
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+class TestShardedMemoryStorage:
+    """Тесты для ShardedMemoryStorage"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_update_data_keeps_all_fields(self):
+        """Параллельные update_data одного ключа не теряют изменений"""
+        storage = ShardedMemoryStorage(n_shards=4)
+        key = _key(42)
+        
+        await asyncio.gather(*(
+            storage.update_data(key, {f"field_{i}": i}) for i in range(100)
+        ))
+        
+        data = await storage.get_data(key)
+        assert data == {f"field_{i}": i for i in range(100)}
+    
+    @pytest.mark.asyncio
+    async def test_users_in_same_shard_are_isolated(self):
+        """Пользователи одного шарда не видят данные друг друга"""
+        storage = ShardedMemoryStorage(n_shards=4)
+        first, second = _key(1), _key(5)
+        
+        await storage.set_data(first, {"a": 1})
+        await storage.set_state(second, "waiting")
+        
+        assert await storage.get_data(second) == {}
+        assert await storage.get_state(first) is None
+        assert await storage.get_state(second) == "waiting"
+    
+    @pytest.mark.asyncio
+    async def test_clear_leaves_no_state(self):
+        """FSMContext.clear удаляет запись пользователя из шарда"""
+        storage = ShardedMemoryStorage(n_shards=4)
+        key = _key(7)
+        context = FSMContext(storage=storage, key=key)
+        
+        await context.set_state("entering_api_key")
+        await context.update_data(draft="value")
+        await context.clear()
+        
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {}
+        assert all(not records for records, _ in storage._shards)
+    
+    @pytest.mark.asyncio
+    async def test_get_data_returns_copy(self):
+        """Изменение полученных данных не меняет хранилище"""
+        storage = ShardedMemoryStorage()
+        key = _key(3)
+        await storage.set_data(key, {"a": 1})
+        
+        data = await storage.get_data(key)
+        data["a"] = 2
+        
+        assert await storage.get_data(key) == {"a": 1}
@@ -0,0 +1,83 @@
+"""
+Тесты для TTLCache
+"""
+import pytest
+
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache
+
+
+class TestTTLCache:
+    """Тесты для TTLCache"""
+    
+    def test_entry_expires_after_ttl(self):
+        """Запись доступна до истечения TTL и пропадает после"""
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("a", 1, now=100.0)
+        
+        assert cache.get("a", now=104.9) == 1
+        assert cache.get("a", now=105.0) is None
+        assert cache.get("a", default="missing", now=100.0) == "missing"
+    
+    def test_expired_entries_removed_on_write(self, monkeypatch):
+        """Истекшие записи вычищаются при следующей записи и не учитываются в len"""
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("a", 1, now=100.0)
+        cache.set("b", 2, now=103.0)
+        cache.set("c", 3, now=106.0)
+        
+        monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: 107.0)
+        assert len(cache) == 2
+        assert "a" not in cache
+        assert cache["b"] == 2
+        with pytest.raises(KeyError):
+            cache["a"]
+    
+    def test_oldest_entry_evicted_over_maxsize(self):
+        """При переполнении вытесняется самая старая запись"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1, now=0.0)
+        cache.set("b", 2, now=1.0)
+        cache.set("c", 3, now=2.0)
+        
+        assert cache.get("a", now=3.0) is None
+        assert cache.get("b", now=3.0) == 2
+        assert cache.get("c", now=3.0) == 3
+    
+    def test_rewrite_moves_entry_to_end(self):
+        """Повторная запись ключа продлевает его жизнь в очереди вытеснения"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1, now=0.0)
+        cache.set("b", 2, now=1.0)
+        cache.set("a", 10, now=2.0)
+        cache.set("c", 3, now=3.0)
+        
+        assert cache.get("b", now=4.0) is None
+        assert cache.get("a", now=4.0) == 10
+        assert cache.get("c", now=4.0) == 3
+    
+    def test_stale_now_keeps_expiry_order(self):
+        """Запись с более ранним now не истекает раньше предыдущих записей"""
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("a", 1, now=100.0)
+        cache.set("b", 2, now=98.0)
+        cache.set("c", 3, now=101.0)
+        
+        expiries = [expires_at for expires_at, _ in cache._data.values()]
+        assert expiries == sorted(expiries)
+        assert cache.get("b", now=104.0) == 2
+        
+        cache.set("d", 4, now=106.0)
+        assert list(cache._data) == ["d"]
+    
+    def test_pop_and_clear(self):
+        """pop возвращает значение один раз, clear удаляет все"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache["a"] = 1
+        cache["b"] = 2
+        
+        assert cache.pop("a") == 1
+        assert cache.pop("a", "gone") == "gone"
+        
+        cache.clear()
+        assert len(cache) == 0
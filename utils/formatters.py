@@ -1,57 +1,64 @@
 """
 Утилиты для форматирования данных
 """
-from typing import Union, Optional
+from typing import Union, Optional, Final
 from datetime import datetime, timedelta
 
 
+# Форматтеры цен по валюте
+_PRICE_FMT = {
+    "USD": "${:.2f}".format,
+    "CLORE": "{:.2f} CLORE".format,
+    "BTC": "{:.8f} BTC".format,
+}
+
+
 def format_price(amount: float, currency: str = "USD") -> str:
     """Форматировать цену"""
-    if currency == "USD":
-        return f"${amount:.2f}"
-    elif currency == "CLORE":
-        return f"{amount:.2f} CLORE"
-    elif currency == "BTC":
-        return f"{amount:.8f} BTC"
-    else:
+    fmt = _PRICE_FMT.get(currency)
+    if fmt is None:
         return f"{amount:.2f} {currency}"
+    return fmt(amount)
 
 
 def format_duration(seconds: int) -> str:
     """Форматировать продолжительность"""
     if seconds < 60:
         return f"{seconds}с"
-    elif seconds < 3600:
-        minutes = seconds // 60
+    
+    minutes, _ = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours == 0:
         return f"{minutes}м"
-    elif seconds < 86400:
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        if minutes > 0:
-            return f"{hours}ч {minutes}м"
-        return f"{hours}ч"
-    else:
-        days = seconds // 86400
-        hours = (seconds % 86400) // 3600
-        if hours > 0:
-            return f"{days}д {hours}ч"
-        return f"{days}д"
+    
+    days, hours = divmod(hours, 24)
+    if days == 0:
+        return f"{hours}ч {minutes}м" if minutes else f"{hours}ч"
+    return f"{days}д {hours}ч" if hours else f"{days}д"
 
 
-def format_datetime(dt: datetime) -> str:
-    """Форматировать дату и время"""
-    now = datetime.now()
+# Пороги относительного времени
+_ONE_MIN = timedelta(minutes=1)
+_ONE_HOUR = timedelta(hours=1)
+_ONE_DAY = timedelta(days=1)
+_ONE_WEEK = timedelta(days=7)
+
+
+def format_datetime(dt: datetime, now: Optional[datetime] = None) -> str:
+    """Форматировать дату и время; now можно передать один раз на весь список"""
+    if now is None:
+        now = datetime.now()
     diff = now - dt
     
-    if diff < timedelta(minutes=1):
+    if diff < _ONE_MIN:
         return "только что"
-    elif diff < timedelta(hours=1):
+    elif diff < _ONE_HOUR:
         minutes = int(diff.total_seconds() / 60)
         return f"{minutes} мин назад"
-    elif diff < timedelta(days=1):
+    elif diff < _ONE_DAY:
         hours = int(diff.total_seconds() / 3600)
         return f"{hours} ч назад"
-    elif diff < timedelta(days=7):
+    elif diff < _ONE_WEEK:
         days = diff.days
         return f"{days} дн назад"
     else:
@@ -63,13 +70,14 @@ def format_percentage(value: float, decimals: int = 1) -> str:
     return f"{value:.{decimals}f}%"
 
 
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+
 def format_size(bytes: int) -> str:
     """Форматировать размер файла/данных"""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes < 1024.0:
-            return f"{bytes:.1f} {unit}"
-        bytes /= 1024.0
-    return f"{bytes:.1f} PB"
+    # Номер единицы измерения - это номер "десятка" битов в числе
+    i = min(len(_SIZE_UNITS) - 1, max(0, (int(bytes).bit_length() - 1) // 10))
+    return f"{bytes / (1 << (10 * i)):.1f} {_SIZE_UNITS[i]}"
 
 
 def format_gpu_string(gpu_count: int, gpu_model: str) -> str:
@@ -84,12 +92,16 @@ def format_server_id(server_id: Union[int, str]) -> str:
     return f"#{server_id}"
 
 
+# Таблица экранирования: один проход translate вместо replace на каждый символ
+_MD_SPECIAL: Final = '_*[]()~`>#+-=|{}.!'
+_MD_TABLE: Final = str.maketrans({c: '\\' + c for c in _MD_SPECIAL})
+
+
 def escape_markdown(text: str) -> str:
     """Экранировать специальные символы для Markdown"""
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+    if not text:
+        return text
+    return text.translate(_MD_TABLE)
 
 
 def truncate_text(text: str, max_length: int = 50, suffix: str = "...") -> str:
@@ -101,13 +113,18 @@ def truncate_text(text: str, max_length: int = 50, suffix: str = "...") -> str:
 
 def format_list(items: list, separator: str = ", ", max_items: int = 10) -> str:
     """Форматировать список элементов"""
-    if len(items) <= max_items:
-        return separator.join(str(item) for item in items)
-    
-    displayed = items[:max_items]
+    head = separator.join(map(str, items[:max_items]))
     remaining = len(items) - max_items
-    result = separator.join(str(item) for item in displayed)
-    return f"{result} и еще {remaining}"
+    if remaining <= 0:
+        return head
+    return f"{head} и еще {remaining}"
+
+
+# Префиксы индикаторов - готовые строки вместо сборки на каждый вызов
+_UP = "📈 +"
+_DOWN = "📉 "
+_REL_G, _REL_Y, _REL_R = "🟢 ", "🟡 ", "🔴 "
+_POWER = "⚡ "
 
 
 def format_balance_change(current: float, previous: float, currency: str = "CLORE") -> str:
@@ -119,41 +136,33 @@ def format_balance_change(current: float, previous: float, currency: str = "CLOR
     percent = (change / previous) * 100
     
     if change > 0:
-        emoji = "📈"
-        sign = "+"
+        return f"{_UP}{change:.4f} {currency} (+{percent:.1f}%)"
     elif change < 0:
-        emoji = "📉"
-        sign = ""
+        return f"{_DOWN}{change:.4f} {currency} ({percent:.1f}%)"
     else:
         return "без изменений"
-    
-    return f"{emoji} {sign}{change:.4f} {currency} ({sign}{percent:.1f}%)"
+
+
+_STARS = tuple("⭐" * i for i in range(6))
 
 
 def format_rating(rating: float, count: int) -> str:
     """Форматировать рейтинг"""
-    stars = "⭐" * int(rating)
+    stars = _STARS[min(5, max(0, int(rating)))]
     return f"{stars} {rating:.1f} ({count} отзывов)"
 
 
 def format_reliability(reliability: float) -> str:
     """Форматировать надежность"""
     percent = reliability * 100
-    if percent >= 99.9:
-        emoji = "🟢"
-    elif percent >= 99:
-        emoji = "🟡"
-    else:
-        emoji = "🔴"
-    
-    return f"{emoji} {percent:.2f}%"
+    prefix = _REL_G if percent >= 99.9 else _REL_Y if percent >= 99 else _REL_R
+    return f"{prefix}{percent:.2f}%"
 
 
 def format_power_consumption(power_watts: int, gpu_count: int = 1) -> str:
     """Форматировать энергопотребление"""
     total = power_watts * gpu_count
     if total < 1000:
-        return f"⚡ {total}W"
+        return f"{_POWER}{total}W"
     else:
-        kw = total / 1000
-        return f"⚡ {kw:.1f}kW"
\ No newline at end of file
+        return f"{_POWER}{total / 1000:.1f}kW"
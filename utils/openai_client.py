@@ -0,0 +1,39 @@
+"""
+Общий клиент OpenAI
+"""
+from typing import Optional, TYPE_CHECKING
+
+import httpx
+
+from config import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+# Один клиент на процесс - keep-alive соединения и TLS сессии переиспользуются
+_client: Optional["AsyncOpenAI"] = None
+
+
+def get_client() -> "AsyncOpenAI":
+    """Получить (или создать) общий клиент OpenAI"""
+    global _client
+    if _client is None:
+        # openai импортируется только при первом обращении
+        from openai import AsyncOpenAI
+        
+        _client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=10)
+            )
+        )
+    return _client
+
+
+async def close():
+    """Закрыть общий клиент и его пул соединений"""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
@@ -0,0 +1,87 @@
+"""
+Ограниченный кеш с временем жизни записей
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Словарь с ограничением размера и временем жизни записей.
+    У всех записей одинаковый TTL, поэтому порядок вставки совпадает
+    с порядком истечения и вытеснение выполняется за O(1) с начала очереди.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def _expire(self, now: float):
+        """Удалить истекшие записи с начала очереди"""
+        data = self._data
+        while data:
+            key, (expires_at, _) = next(iter(data.items()))
+            if expires_at > now:
+                break
+            del data[key]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def set(self, key: Hashable, value: Any, now: Optional[float] = None):
+        """Сохранить значение; now позволяет взять одно время на пачку операций"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        data = self._data
+        expires_at = now + self.ttl
+        if data:
+            # Запись с устаревшим now не должна истекать раньше хвоста очереди,
+            # иначе нарушится порядок, на котором держится _expire
+            expires_at = max(expires_at, data[next(reversed(data))][0])
+        data[key] = (expires_at, value)
+        data.move_to_end(key)
+
+        # Вытесняем самые старые записи сверх лимита
+        while len(data) > self.maxsize:
+            data.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None, now: Optional[float] = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        if item[0] <= (time.monotonic() if now is None else now):
+            del self._data[key]
+            return default
+        return item[1]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            self._data.pop(key, None)
+            raise KeyError(key)
+        return item[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        if item is None:
+            return False
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            return False
+        return True
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        self._expire(time.monotonic())
+        return len(self._data)